@@ -1,5 +1,4 @@
-from flask import Flask, jsonify, request, send_from_directory
-import os
+from flask import Flask, Response, jsonify, request, send_from_directory, stream_with_context
 
 # Create Flask app
 app = Flask(__name__)
@@ -14,14 +13,34 @@ try:
     if str(ROOT) not in sys.path:
         sys.path.insert(0, str(ROOT))
     
-    from utils.extract import extract_text_from_upload
-    from utils.quizgen import generate_quiz
-    from utils.ai_quiz import generate_quiz_ai
+    from utils.extract import MAX_UPLOAD_BYTES, UploadTooLarge, extract_text_from_upload, extraction_cache_stats
+    from utils.ai_quiz import ai_cache_stats
+    from utils.documents import describe_document, get_document_store
+    from utils.jobs import get_job_runner
+    from utils.metrics import instrument_flask, render_metrics
+    from utils.profiling import get_profile, list_profiles, profiled, render_profile, token_matches
+    from utils.quizgen import index_document, question_pool_stats
+    from utils.pipeline import (
+        QUIZ_CACHE_MAX_AGE, format_sse, iter_run_quiz, parse_batch_payload, parse_quiz_payload, quiz_etag, run_quiz,
+        run_quiz_batch, warm_up
+    )
     
     UTILS_AVAILABLE = True
 except ImportError:
     UTILS_AVAILABLE = False
 
+    def profiled(name):
+        return lambda view: view
+
+if UTILS_AVAILABLE:
+    # Werkzeug refuses larger request bodies before they are spooled (None = no limit)
+    app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES or None
+    instrument_flask(app)
+
+    @app.errorhandler(413)
+    def request_too_large(exc):
+        return jsonify({"error": f"Upload exceeds the {MAX_UPLOAD_BYTES} byte limit"}), 413
+
 ALLOWED_EXTENSIONS = {"pdf", "docx", "txt"}
 
 def is_allowed_file(filename: str) -> bool:
@@ -72,6 +91,10 @@ def index():
                 <label for="textInput">Text content:</label>
                 <textarea id="textInput" rows="6" placeholder="Paste your text here..."></textarea>
             </div>
+            <div id="docAttached" style="display: none;">
+                <p id="docAttachedText"></p>
+                <button type="button" id="detachBtn">Detach document</button>
+            </div>
         </div>
         
         <div class="container">
@@ -100,6 +123,33 @@ def index():
         </div>
         
         <script>
+            // Set by an upload; the extracted text stays on the server and is referenced by id.
+            // The textarea only shows a preview, so it is read-only until the document is detached.
+            let docId = null;
+            let docTruncated = false;
+            const textInput = document.getElementById('textInput');
+
+            function attachDocument(result) {
+                docId = result.doc_id;
+                docTruncated = !!result.truncated;
+                textInput.value = result.preview;
+                textInput.readOnly = true;
+                document.getElementById('docAttachedText').textContent = docTruncated
+                    ? 'Quizzes use the whole uploaded document; the box shows its beginning.'
+                    : 'Quizzes use the uploaded document.';
+                document.getElementById('docAttached').style.display = 'block';
+            }
+
+            document.getElementById('detachBtn').addEventListener('click', () => {
+                // A shortened preview is not the document, so it is not left behind as editable text
+                if (docTruncated) textInput.value = '';
+                docId = null;
+                docTruncated = false;
+                textInput.readOnly = false;
+                document.getElementById('docAttached').style.display = 'none';
+                textInput.focus();
+            });
+
             document.getElementById('uploadForm').addEventListener('submit', async (e) => {
                 e.preventDefault();
                 const formData = new FormData();
@@ -114,9 +164,9 @@ def index():
                     const result = await response.json();
                     
                     if (result.status === 'success') {
-                        document.getElementById('textInput').value = result.text;
+                        attachDocument(result);
                         document.getElementById('uploadResult').innerHTML = 
-                            '<div class="success">Text extracted successfully! Length: ' + result.text.length + ' characters</div>';
+                            '<div class="success">Text extracted successfully! Length: ' + result.chars + ' characters</div>';
                     } else {
                         document.getElementById('uploadResult').innerHTML = 
                             '<div class="error">Error: ' + result.error + '</div>';
@@ -136,11 +186,11 @@ def index():
                 }
                 
                 const data = {
-                    text: text,
                     num_questions: parseInt(document.getElementById('numQuestions').value),
                     mode: document.getElementById('quizMode').value,
                     use_ai: document.getElementById('useAI').checked
                 };
+                if (docId) data.doc_id = docId; else data.text = text;
                 
                 try {
                     const response = await fetch('/generate-quiz', {
@@ -222,6 +272,7 @@ def policy():
     })
 
 @app.route("/upload", methods=["POST"])
+@profiled("/upload")
 def upload():
     if not UTILS_AVAILABLE:
         return jsonify({
@@ -241,15 +292,23 @@ def upload():
 
     try:
         text_content = extract_text_from_upload(file)
-        return jsonify({
-            "text": text_content,
-            "status": "success",
-            "filename": file.filename
-        })
+        index_document(text_content)
+        result = describe_document(get_document_store().put(text_content), text_content)
+        result["status"] = "success"
+        result["filename"] = file.filename
+        return jsonify(result)
+    except UploadTooLarge as exc:
+        return jsonify({"error": str(exc)}), 413
     except Exception as exc:
         return jsonify({"error": f"Failed to extract text: {exc}"}), 500
 
-@app.route("/generate-quiz", methods=["POST"])
+def _cacheable(response, etag):
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = f"public, max-age={QUIZ_CACHE_MAX_AGE}"
+    return response
+
+@app.route("/generate-quiz", methods=["GET", "POST"])
+@profiled("/generate-quiz")
 def generate_quiz_endpoint():
     if not UTILS_AVAILABLE:
         return jsonify({
@@ -257,57 +316,145 @@ def generate_quiz_endpoint():
             "status": "error"
         }), 500
     
-    payload = request.get_json(silent=True) or {}
-    text = (payload.get("text") or "").strip()
-    num_questions = int(payload.get("num_questions") or 5)
-    num_questions = max(1, min(100, num_questions))
-    mode = (payload.get("mode") or "mcq").strip().lower()
-    use_ai = bool(payload.get("use_ai"))
+    # GET takes the same fields as query parameters (with a doc_id), so the CDN can cache seeded quizzes
+    payload = request.args.to_dict() if request.method == "GET" else request.get_json(silent=True) or {}
+    try:
+        etag = quiz_etag(payload)
+        # A repeated seeded request is answered before the document is loaded or anything is generated
+        if etag is not None and request.if_none_match.contains(etag):
+            return _cacheable(Response(status=304), etag)
+        params = parse_quiz_payload(payload)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
     
-    if not text:
-        return jsonify({"error": "Text is required"}), 400
+    try:
+        result = run_quiz(**params)
+        result["status"] = "success"
+    except Exception as exc:
+        return jsonify({"error": f"Quiz generation failed: {exc}"}), 500
+    response = jsonify(result)
+    return _cacheable(response, etag) if etag is not None else response
+
+@app.route("/generate-quiz/stream", methods=["POST"])
+def generate_quiz_stream():
+    if not UTILS_AVAILABLE:
+        return jsonify({
+            "error": "Quiz generation utilities not available",
+            "status": "error"
+        }), 500
     
+    payload = request.get_json(silent=True) or {}
     try:
-        used_ai = False
-        provider = None
-        fallback_used = False
-        ai_error = None
-        questions = []
-        
-        if use_ai:
-            try:
-                provider = "google" if os.environ.get("GOOGLE_API_KEY") or (os.environ.get("AI_PROVIDER", "").lower() == "google") else "openai"
-                questions = generate_quiz_ai(text, num_questions=num_questions, mode=mode)
-                used_ai = True if questions else False
-            except Exception as e:
-                used_ai = False
-                questions = []
-                ai_error = str(e)
-        
-        if not questions:
-            questions = generate_quiz(text, num_questions=num_questions, mode=mode)
-            fallback_used = use_ai
-        
+        params = parse_quiz_payload(payload)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    
+    def events():
+        try:
+            for event, data in iter_run_quiz(**params):
+                yield format_sse(event, data)
+        except Exception as exc:
+            yield format_sse("error", {"error": f"Quiz generation failed: {exc}"})
+    
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/generate-quiz/batch", methods=["POST"])
+def generate_quiz_batch():
+    if not UTILS_AVAILABLE:
         return jsonify({
-            "questions": questions,
-            "used_ai": used_ai,
-            "provider": provider,
-            "fallback": fallback_used,
-            "ai_error": ai_error,
-            "status": "success"
-        })
+            "error": "Quiz generation utilities not available",
+            "status": "error"
+        }), 500
+    
+    payload = request.get_json(silent=True) or {}
+    try:
+        items = parse_batch_payload(payload)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    
+    try:
+        return jsonify({"results": run_quiz_batch(items), "status": "success"})
     except Exception as exc:
         return jsonify({"error": f"Quiz generation failed: {exc}"}), 500
 
+@app.route("/jobs", methods=["POST"])
+def create_job():
+    if not UTILS_AVAILABLE:
+        return jsonify({
+            "error": "Quiz generation utilities not available",
+            "status": "error"
+        }), 500
+    
+    payload = request.get_json(silent=True) or {}
+    try:
+        params = parse_quiz_payload(payload)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    
+    job = get_job_runner().submit(run_quiz, params)
+    return jsonify({"job_id": job["id"], "status": job["status"]}), 202
+
+@app.route("/jobs/<job_id>")
+def get_job(job_id):
+    if not UTILS_AVAILABLE:
+        return jsonify({
+            "error": "Quiz generation utilities not available",
+            "status": "error"
+        }), 500
+    
+    job = get_job_runner().store.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found or expired"}), 404
+    return jsonify(job)
+
 # Health check endpoint
 @app.route("/health")
 def health():
     return jsonify({
         "status": "healthy",
         "service": "quiz-generator",
-        "utils_available": UTILS_AVAILABLE
+        "utils_available": UTILS_AVAILABLE,
+        "extract_cache": extraction_cache_stats() if UTILS_AVAILABLE else None,
+        "ai_cache": ai_cache_stats() if UTILS_AVAILABLE else None,
+        "question_pool": question_pool_stats() if UTILS_AVAILABLE else None
     })
 
+@app.route("/warmup")
+def warmup():
+    # Vercel cron or a post-deploy hook can call this so the first real request skips SDK/parser imports
+    if not UTILS_AVAILABLE:
+        return jsonify({"status": "error", "error": "Utils not available"}), 500
+    return jsonify({"status": "warm", "timings_ms": warm_up()})
+
+@app.route("/metrics")
+def metrics():
+    if not UTILS_AVAILABLE:
+        return jsonify({"error": "Metrics not available"}), 500
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+def _profile_admin_allowed() -> bool:
+    return UTILS_AVAILABLE and token_matches(request.headers.get("X-Profile-Token") or request.args.get("token"))
+
+@app.route("/admin/profiles")
+def profiles():
+    if not _profile_admin_allowed():
+        return jsonify({"error": "Not found"}), 404
+    return jsonify({"profiles": list_profiles(), "status": "success"})
+
+@app.route("/admin/profiles/<int:profile_id>")
+def profile_detail(profile_id):
+    if not _profile_admin_allowed():
+        return jsonify({"error": "Not found"}), 404
+    record = get_profile(profile_id)
+    if record is None:
+        return jsonify({"error": "Profile not found"}), 404
+    fmt = request.args.get("format", "text")
+    if fmt not in ("text", "pstats", "collapsed"):
+        return jsonify({"error": "format must be text, pstats or collapsed"}), 400
+    body, mimetype = render_profile(record, fmt)
+    return Response(body, mimetype=mimetype)
+
 if __name__ == "__main__":
     app.run(debug=False)
 
@@ -1,11 +1,22 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
 from werkzeug.utils import secure_filename
-from utils.extract import extract_text_from_upload
-from utils.quizgen import generate_quiz
-from utils.ai_quiz import generate_quiz_ai
+from utils.extract import MAX_UPLOAD_BYTES, UploadTooLarge, extract_text_from_upload, extraction_cache_stats
+from utils.ai_quiz import ai_cache_stats
+from utils.documents import describe_document, get_document_store
+from utils.jobs import get_job_runner
+from utils.metrics import instrument_flask, render_metrics
+from utils.profiling import get_profile, list_profiles, profiled, render_profile, token_matches
+from utils.quizgen import index_document, question_pool_stats
+from utils.pipeline import (
+	QUIZ_CACHE_MAX_AGE, format_sse, iter_run_quiz, parse_batch_payload, quiz_etag, quiz_params, run_quiz,
+	run_quiz_batch, warm_up,
+)
 import os
 
 app = Flask(__name__)
+# Werkzeug refuses larger request bodies before they are spooled (None = no limit)
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES or None
+instrument_flask(app)
 
 ALLOWED_EXTENSIONS = {"pdf", "docx", "txt"}
 
@@ -14,6 +25,11 @@ def is_allowed_file(filename: str) -> bool:
 	return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+@app.errorhandler(413)
+def request_too_large(exc):
+	return jsonify({"error": f"Upload exceeds the {MAX_UPLOAD_BYTES} byte limit"}), 413
+
+
 @app.get("/")
 def index():
 	return render_template("index.html")
@@ -34,6 +50,7 @@ def policy():
 
 
 @app.post("/upload")
+@profiled("/upload")
 def upload():
 	if "file" not in request.files:
 		return jsonify({"error": "No file part"}), 400
@@ -46,57 +63,141 @@ def upload():
 	# Process directly from file stream; no need to save to disk
 	try:
 		text_content = extract_text_from_upload(file)
-		return jsonify({"text": text_content})
+		index_document(text_content)
+		# The text stays on the server; /generate-quiz takes the doc_id instead
+		doc_id = get_document_store().put(text_content)
+		return jsonify(describe_document(doc_id, text_content))
+	except UploadTooLarge as exc:
+		return jsonify({"error": str(exc)}), 413
 	except Exception as exc:
 		return jsonify({"error": f"Failed to extract text: {exc}"}), 500
 
 
+def _cacheable(response, etag):
+	response.set_etag(etag)
+	response.headers["Cache-Control"] = f"public, max-age={QUIZ_CACHE_MAX_AGE}"
+	return response
+
+
+@app.get("/generate-quiz")
 @app.post("/generate-quiz")
+@profiled("/generate-quiz")
 def generate_quiz_endpoint():
+	# GET takes the same fields as query parameters (with a doc_id), so CDNs and browsers can cache seeded quizzes
+	payload = request.args.to_dict() if request.method == "GET" else request.get_json(silent=True) or {}
+	try:
+		etag = quiz_etag(payload)
+		# A repeated seeded request is answered before the document is loaded or anything is generated
+		if etag is not None and request.if_none_match.contains(etag):
+			return _cacheable(Response(status=304), etag)
+		params = quiz_params(payload)
+	except ValueError as exc:
+		return jsonify({"error": str(exc)}), 400
+	try:
+		response = jsonify(run_quiz(**params))
+	except Exception as exc:
+		return jsonify({"error": f"Quiz generation failed: {exc}"}), 500
+	return _cacheable(response, etag) if etag is not None else response
+
+
+@app.post("/generate-quiz/stream")
+def generate_quiz_stream():
 	payload = request.get_json(silent=True) or {}
-	text = (payload.get("text") or "").strip()
-	num_questions = int(payload.get("num_questions") or 5)
-	# Enforce quiz generation limit: 1..100
-	num_questions = max(1, min(100, num_questions))
-	mode = (payload.get("mode") or "mcq").strip().lower()
-	use_ai = bool(payload.get("use_ai"))
-	# Graceful fallback: if no provider credentials are present, disable AI mode
-	if use_ai:
-		has_openai_like = bool(os.environ.get("AI_API_KEY") or os.environ.get("OPENAI_API_KEY"))
-		has_google = bool(os.environ.get("GOOGLE_API_KEY") or (os.environ.get("AI_PROVIDER", "").lower() == "google"))
-		if not (has_openai_like or has_google):
-			use_ai = False
-	if not text:
-		return jsonify({"error": "Text is required"}), 400
 	try:
-		used_ai = False
-		provider = None
-		fallback_used = False
-		ai_error = None
-		questions = []
-		if use_ai:
-			try:
-				provider = "google" if os.environ.get("GOOGLE_API_KEY") or (os.environ.get("AI_PROVIDER", "").lower() == "google") else "openai"
-				questions = generate_quiz_ai(text, num_questions=num_questions, mode=mode)
-				used_ai = True if questions else False
-			except Exception as e:
-				used_ai = False
-				questions = []
-				ai_error = str(e)
-		if not questions:
-			questions = generate_quiz(text, num_questions=num_questions, mode=mode)
-			fallback_used = use_ai
-		return jsonify({
-			"questions": questions,
-			"used_ai": used_ai,
-			"provider": provider,
-			"fallback": fallback_used,
-			"ai_error": ai_error
-		})
+		params = quiz_params(payload)
+	except ValueError as exc:
+		return jsonify({"error": str(exc)}), 400
+
+	def events():
+		try:
+			for event, data in iter_run_quiz(**params):
+				yield format_sse(event, data)
+		except Exception as exc:
+			yield format_sse("error", {"error": f"Quiz generation failed: {exc}"})
+
+	return Response(stream_with_context(events()), mimetype="text/event-stream",
+		headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.post("/generate-quiz/batch")
+def generate_quiz_batch():
+	payload = request.get_json(silent=True) or {}
+	try:
+		items = parse_batch_payload(payload, quiz_params)
+	except ValueError as exc:
+		return jsonify({"error": str(exc)}), 400
+	try:
+		return jsonify({"results": run_quiz_batch(items)})
 	except Exception as exc:
 		return jsonify({"error": f"Quiz generation failed: {exc}"}), 500
 
 
+@app.post("/jobs")
+def create_job():
+	payload = request.get_json(silent=True) or {}
+	try:
+		params = quiz_params(payload)
+	except ValueError as exc:
+		return jsonify({"error": str(exc)}), 400
+	job = get_job_runner().submit(run_quiz, params)
+	return jsonify({"job_id": job["id"], "status": job["status"]}), 202
+
+
+@app.get("/jobs/<job_id>")
+def get_job(job_id):
+	job = get_job_runner().store.get(job_id)
+	if job is None:
+		return jsonify({"error": "Job not found or expired"}), 404
+	return jsonify(job)
+
+
+@app.get("/health")
+def health():
+	return jsonify({
+		"status": "healthy",
+		"service": "quiz-generator",
+		"extract_cache": extraction_cache_stats(),
+		"ai_cache": ai_cache_stats(),
+		"question_pool": question_pool_stats()
+	})
+
+
+@app.get("/warmup")
+def warmup():
+	# Hit this after a deploy (or from a cron) so the first real request skips SDK/parser imports
+	return jsonify({"status": "warm", "timings_ms": warm_up()})
+
+
+@app.get("/metrics")
+def metrics():
+	return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+def _profile_admin_allowed() -> bool:
+	return token_matches(request.headers.get("X-Profile-Token") or request.args.get("token"))
+
+
+@app.get("/admin/profiles")
+def profiles():
+	if not _profile_admin_allowed():
+		return jsonify({"error": "Not found"}), 404
+	return jsonify({"profiles": list_profiles()})
+
+
+@app.get("/admin/profiles/<int:profile_id>")
+def profile_detail(profile_id):
+	if not _profile_admin_allowed():
+		return jsonify({"error": "Not found"}), 404
+	record = get_profile(profile_id)
+	if record is None:
+		return jsonify({"error": "Profile not found"}), 404
+	fmt = request.args.get("format", "text")
+	if fmt not in ("text", "pstats", "collapsed"):
+		return jsonify({"error": "format must be text, pstats or collapsed"}), 400
+	body, mimetype = render_profile(record, fmt)
+	return Response(body, mimetype=mimetype)
+
+
 if __name__ == "__main__":
 	port = int(os.environ.get("PORT", 5000))
 	app.run(host="0.0.0.0", port=port, debug=True)
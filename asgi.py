@@ -0,0 +1,103 @@
+"""ASGI entry point: /generate-quiz and /generate-quiz/stream run on asyncio, every other route is the Flask app.
+
+	uvicorn asgi:app --workers 2
+
+Requests waiting on an AI provider hold a coroutine instead of a worker
+thread, so one process keeps many provider calls in flight. Heuristic
+generation and document loading run on worker threads; the Flask routes
+(uploads included) run on ASGI_WSGI_THREADS threads per process.
+
+A /generate-quiz request picked for profiling (X-Profile or
+PROFILE_SAMPLE_RATE) runs the synchronous pipeline on one worker thread
+instead, because cProfile only follows the thread it runs on.
+"""
+import asyncio
+import os
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route, request_response
+from werkzeug.http import parse_etags, quote_etag
+
+from app import app as flask_app
+from utils.metrics import instrument_asgi
+from utils.pipeline import (
+	QUIZ_CACHE_MAX_AGE, format_sse, iter_run_quiz_async, quiz_etag, quiz_params, run_quiz, run_quiz_async,
+)
+from utils.profiling import PROFILE_HEADER, run_profiled, should_profile
+
+# Threads per process for the routes served by the Flask app
+ASGI_WSGI_THREADS = int(os.environ.get("ASGI_WSGI_THREADS", "10") or 10)
+
+
+async def _json_payload(request: Request) -> dict:
+	# Same leniency as Flask's get_json(silent=True): a missing or malformed body is an empty payload
+	try:
+		payload = await request.json()
+	except ValueError:
+		return {}
+	return payload if isinstance(payload, dict) else {}
+
+
+def _cache_headers(etag: str) -> dict:
+	return {"ETag": quote_etag(etag), "Cache-Control": f"public, max-age={QUIZ_CACHE_MAX_AGE}"}
+
+
+async def generate_quiz_endpoint(request: Request) -> Response:
+	payload = dict(request.query_params) if request.method == "GET" else await _json_payload(request)
+	try:
+		etag = quiz_etag(payload)
+		if etag is not None and parse_etags(request.headers.get("if-none-match")).contains(etag):
+			return Response(status_code=304, headers=_cache_headers(etag))
+		# Loading a stored document is a SQLite read, so it stays off the event loop
+		params = await asyncio.to_thread(quiz_params, payload)
+	except ValueError as exc:
+		return JSONResponse({"error": str(exc)}, status_code=400)
+	try:
+		if should_profile(request.headers.get(PROFILE_HEADER)):
+			content_length = int(request.headers.get("content-length") or 0) or None
+			result = await asyncio.to_thread(
+				run_profiled, "/generate-quiz", lambda: run_quiz(**params), content_length
+			)
+		else:
+			result = await run_quiz_async(**params)
+	except Exception as exc:
+		return JSONResponse({"error": f"Quiz generation failed: {exc}"}, status_code=500)
+	return JSONResponse(result, headers=_cache_headers(etag) if etag is not None else None)
+
+
+async def generate_quiz_stream(request: Request) -> Response:
+	payload = await _json_payload(request)
+	try:
+		params = await asyncio.to_thread(quiz_params, payload)
+	except ValueError as exc:
+		return JSONResponse({"error": str(exc)}, status_code=400)
+
+	async def events():
+		try:
+			async for event, data in iter_run_quiz_async(**params):
+				yield format_sse(event, data)
+		except Exception as exc:
+			yield format_sse("error", {"error": f"Quiz generation failed: {exc}"})
+
+	return StreamingResponse(events(), media_type="text/event-stream",
+		headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def _route(path: str, endpoint, methods) -> Route:
+	return Route(path, instrument_asgi(request_response(endpoint), path), methods=methods)
+
+
+app = Starlette(routes=[
+	_route("/generate-quiz", generate_quiz_endpoint, ["GET", "POST"]),
+	_route("/generate-quiz/stream", generate_quiz_stream, ["POST"]),
+	Mount("/", WSGIMiddleware(flask_app, workers=ASGI_WSGI_THREADS)),
+])
+
+
+if __name__ == "__main__":
+	import uvicorn
+
+	uvicorn.run("asgi:app", host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
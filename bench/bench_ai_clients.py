@@ -0,0 +1,52 @@
+"""Benchmark: AI request latency with a fresh client per call vs the shared client registry.
+
+Runs against bench.fake_provider on localhost with the response cache disabled.
+
+	python -m bench.bench_ai_clients
+"""
+import os
+import statistics
+import time
+
+from bench.fake_provider import FakeProvider
+from utils import ai_quiz
+
+
+def _percentile(samples, pct: float) -> float:
+	ordered = sorted(samples)
+	return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def _run(calls: int):
+	samples = []
+	for _ in range(calls):
+		start = time.perf_counter()
+		ai_quiz.generate_quiz_ai("The enzyme converts glucose.", num_questions=5, use_cache=False)
+		samples.append(time.perf_counter() - start)
+	return samples
+
+
+def main(calls: int = 200) -> None:
+	server = FakeProvider().start()
+	os.environ.update({"AI_API_KEY": "test", "AI_BASE_URL": server.base_url, "AI_PROVIDER": "openai"})
+	os.environ.pop("GOOGLE_API_KEY", None)
+	try:
+		_run(5)  # warm up imports and the server
+
+		ai_quiz.reset_clients()
+		original = ai_quiz._get_client
+		ai_quiz._get_client = ai_quiz._create_client
+		try:
+			fresh = _run(calls)
+		finally:
+			ai_quiz._get_client = original
+		shared = _run(calls)
+	finally:
+		server.stop()
+
+	for name, samples in (("fresh client", fresh), ("shared client", shared)):
+		print(f"{name:14} p50 {statistics.median(samples) * 1e3:7.2f} ms   p95 {_percentile(samples, 0.95) * 1e3:7.2f} ms")
+
+
+if __name__ == "__main__":
+	main()
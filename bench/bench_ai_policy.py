@@ -0,0 +1,59 @@
+"""Benchmark: AI request success rate and tail latency under injected failures.
+
+Compares no retries, retries with backoff, and retries plus hedging against
+bench.fake_provider with a fraction of 429s and slow responses.
+
+	python -m bench.bench_ai_policy
+"""
+import os
+import statistics
+import time
+
+from bench.fake_provider import FakeProvider
+from utils import ai_quiz
+from utils.ai_policy import CallPolicy, call_with_policy
+
+
+def _percentile(samples, pct: float) -> float:
+	ordered = sorted(samples)
+	return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def _run(config, policy: CallPolicy, calls: int):
+	samples, failures = [], 0
+	prompt = ai_quiz._build_prompt("The enzyme converts glucose.", 5, "mcq")
+	for _ in range(calls):
+		start = time.perf_counter()
+		try:
+			call_with_policy(lambda: ai_quiz._request_completion(prompt, config, policy.timeout), policy)
+		except Exception:
+			failures += 1
+		samples.append(time.perf_counter() - start)
+	return samples, failures
+
+
+def main(calls: int = 200, error_rate: float = 0.1, slow_rate: float = 0.05) -> None:
+	server = FakeProvider(latency=0.01, error_rate=error_rate, slow_rate=slow_rate, slow_latency=0.5).start()
+	os.environ.update({"AI_API_KEY": "test", "AI_BASE_URL": server.base_url})
+	os.environ.pop("GOOGLE_API_KEY", None)
+	config = ai_quiz._provider_config(provider="openai")
+	policies = (
+		("no retries", CallPolicy(max_retries=0, hedge_after=0)),
+		("retries", CallPolicy(max_retries=3, backoff_base=0.05, hedge_after=0)),
+		("retries+hedge", CallPolicy(max_retries=3, backoff_base=0.05, hedge_after=0.05)),
+	)
+	try:
+		ai_quiz.reset_clients()
+		_run(config, policies[0][1], 5)  # warm up the client and the server
+		for name, policy in policies:
+			samples, failures = _run(config, policy, calls)
+			print(
+				f"{name:14} ok {100 * (calls - failures) / calls:5.1f}%   "
+				f"p50 {statistics.median(samples) * 1e3:7.2f} ms   p95 {_percentile(samples, 0.95) * 1e3:7.2f} ms   p99 {_percentile(samples, 0.99) * 1e3:7.2f} ms"
+			)
+	finally:
+		server.stop()
+
+
+if __name__ == "__main__":
+	main()
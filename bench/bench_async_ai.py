@@ -0,0 +1,65 @@
+"""Benchmark: concurrent AI quiz requests, blocking workers vs one event loop.
+
+Sends ``--requests`` distinct prompts to bench.fake_provider (with ``--latency``
+seconds per response, response cache disabled) through ``generate_quiz_ai`` on
+``--threads`` threads, like sync gunicorn workers, and through
+``generate_quiz_ai_async`` on a single asyncio loop, like one ASGI worker.
+
+	python -m bench.bench_async_ai
+	python -m bench.bench_async_ai --requests 500 --latency 1.0
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.fake_provider import FakeProvider
+from utils import ai_quiz
+
+TEXT = "The enzyme converts glucose into usable energy inside request number {}."
+
+
+def _threads(requests: int, threads: int) -> float:
+	start = time.perf_counter()
+	with ThreadPoolExecutor(max_workers=threads) as pool:
+		list(pool.map(lambda i: ai_quiz.generate_quiz_ai(TEXT.format(i), 5, use_cache=False), range(requests)))
+	return time.perf_counter() - start
+
+
+async def _event_loop(requests: int) -> float:
+	start = time.perf_counter()
+	await asyncio.gather(*(ai_quiz.generate_quiz_ai_async(TEXT.format(i), 5, use_cache=False) for i in range(requests)))
+	return time.perf_counter() - start
+
+
+def main(argv=None) -> int:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--requests", type=int, default=200)
+	parser.add_argument("--latency", type=float, default=0.5, help="seconds the fake provider takes per response")
+	parser.add_argument("--threads", type=int, default=2, help="blocking workers to compare against")
+	args = parser.parse_args(argv)
+
+	server = FakeProvider(latency=args.latency).start()
+	os.environ.update({"AI_API_KEY": "test", "AI_BASE_URL": server.base_url, "AI_PROVIDER": "openai"})
+	os.environ.pop("GOOGLE_API_KEY", None)
+	try:
+		# Warm up imports and connections on both paths
+		_threads(args.threads, args.threads)
+		asyncio.run(_event_loop(args.threads))
+		results = {
+			f"{args.threads} blocking threads": _threads(args.requests, args.threads),
+			"1 event loop": asyncio.run(_event_loop(args.requests)),
+		}
+	finally:
+		server.stop()
+
+	print(f"{args.requests} requests, {args.latency * 1e3:.0f} ms provider latency")
+	for name, elapsed in results.items():
+		print(f"    {name:20} {elapsed:8.2f} s   {args.requests / elapsed:8.1f} quizzes/s")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,61 @@
+"""Microbenchmark: per-question cost of blanking/substituting the keyword on a 100-question run.
+
+Compares the legacy approach (compiling ``\\b<word>\\b`` for every question,
+which thrashes ``re``'s pattern cache on a large vocabulary) with slicing at
+the keyword's token span. Table and analysis are built once, outside the timing.
+
+	python -m bench.bench_blanking
+"""
+import random
+import re
+import time
+
+from bench.corpus import make_text
+from utils.quizgen import _choose_keyword, _DocumentAnalysis, _replace_token, _SentenceTable
+
+
+def _legacy_blank(sentence: str, word: str) -> str:
+	pattern = re.compile(rf"\b{re.escape(word)}\b", re.IGNORECASE)
+	return pattern.sub("_____", sentence, count=1)
+
+
+def _time(fn, repeats: int) -> float:
+	best = float("inf")
+	for _ in range(repeats):
+		start = time.perf_counter()
+		fn()
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+def main(size_bytes: int = 1_000_000, questions: int = 100, repeats: int = 20) -> None:
+	# A large vocabulary so most keywords are distinct, as in real documents
+	text = make_text(size_bytes, vocabulary_size=20_000)
+	table = _SentenceTable(text)
+	analysis = _DocumentAnalysis(table)
+	picks = []
+	for i in range(len(table)):
+		keyword, token = _choose_keyword(table, i, analysis.score)
+		if keyword:
+			picks.append((i, keyword, token))
+	random.Random(0).shuffle(picks)
+
+	def legacy():
+		for i, keyword, _ in picks[:questions]:
+			_legacy_blank(table.sentence(i), keyword)
+
+	def sliced():
+		for i, _, token in picks[:questions]:
+			_replace_token(table, i, token, "_____")
+
+	def legacy_cold():
+		re.purge()
+		legacy()
+
+	print(f"text: {len(text)} bytes, vocabulary: {len(table.vocab)} words, {questions} questions")
+	for name, fn in (("regex (cold cache)", legacy_cold), ("regex (warm cache)", legacy), ("token slicing", sliced)):
+		print(f"{name:20} {_time(fn, repeats) / questions * 1e6:8.2f} us/question")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,53 @@
+"""Microbenchmark: per-question distractor sampling on a 1 MB document.
+
+Compares the legacy approach (re-ranking the whole vocabulary on every call)
+with sampling from the precomputed document analysis.
+
+	python -m bench.bench_distractors
+"""
+import random
+import time
+from collections import Counter
+
+from bench.corpus import make_text
+from utils.quizgen import BASIC_STOPWORDS, _distractor_source, _DocumentAnalysis, _make_distractors, _SentenceTable, _tokenize_words
+
+
+def _legacy_make_distractors(correct, global_freq, k):
+	common = [w for w, _ in Counter(global_freq).most_common(100)
+			  if w != correct and len(w) > 3 and w not in BASIC_STOPWORDS]
+	random.shuffle(common)
+	return common[:k]
+
+
+def _time(fn, calls: int) -> float:
+	start = time.perf_counter()
+	for _ in range(calls):
+		fn()
+	return (time.perf_counter() - start) / calls
+
+
+def main(size_bytes: int = 1_000_000, calls: int = 100) -> None:
+	text = make_text(size_bytes)
+	words = [w for w in _tokenize_words(text) if len(w) > 3 and w not in BASIC_STOPWORDS]
+	freq = Counter(words)
+	correct = freq.most_common(1)[0][0]
+
+	build_start = time.perf_counter()
+	analysis = _DocumentAnalysis(_SentenceTable(text))
+	build = time.perf_counter() - build_start
+
+	source = _distractor_source(correct, analysis.pool, analysis.buckets)
+	rng = random.Random(0)
+	legacy = _time(lambda: _legacy_make_distractors(correct, freq, 3), calls)
+	pooled = _time(lambda: _make_distractors(correct, source, 3, rng), calls)
+
+	print(f"text: {len(text)} bytes, vocabulary: {len(freq)} words")
+	print(f"analysis build (once): {build * 1e3:.3f} ms")
+	print(f"legacy per call:       {legacy * 1e6:.1f} us")
+	print(f"pooled per call:       {pooled * 1e6:.1f} us")
+	print(f"speedup:               {legacy / pooled:.1f}x")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,101 @@
+"""Benchmark: DOCX extraction time, peak RSS and text coverage, streaming reader vs python-docx.
+
+Each (document, extractor) pair runs in a fresh interpreter so the peak RSS
+reflects that extraction alone; the reported RSS is the growth over the
+process's footprint just before extracting.
+
+	python -m bench.bench_docx
+	python -m bench.bench_docx --paragraphs 20000 --table-rows 5000
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.bench_startup import ROOT
+from bench.corpus import make_docx, make_sentence, make_vocabulary
+
+EXTRACTORS = ("stream", "python-docx")
+
+
+def _rss_kb() -> int:
+	"""Peak RSS of this process in KB."""
+	# ru_maxrss can carry over the parent's peak through fork + exec; VmHWM belongs to this image only
+	try:
+		with open("/proc/self/status") as fh:
+			for line in fh:
+				if line.startswith("VmHWM:"):
+					return int(line.split()[1])
+	except OSError:
+		pass
+	# Linux reports kilobytes, macOS bytes
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _run_one(extractor: str, path: str) -> None:
+	"""Worker: extract ``path`` once and print a JSON line with time, RSS growth and output size."""
+	import docx  # noqa: F401  (imported up front so both extractors start from the same footprint)
+
+	from utils.extract import _iter_docx_python_docx, _iter_docx_xml
+
+	iterate = _iter_docx_xml if extractor == "stream" else _iter_docx_python_docx
+	before = _rss_kb()
+	start = time.perf_counter()
+	with open(path, "rb") as fh:
+		chars = pieces = 0
+		for piece in iterate(fh):
+			chars += len(piece)
+			pieces += 1
+	elapsed = time.perf_counter() - start
+	print(json.dumps({"ms": elapsed * 1e3, "rss_kb": _rss_kb() - before, "chars": chars, "pieces": pieces}))
+
+
+def _measure(extractor: str, path: str) -> dict:
+	result = subprocess.run(
+		[sys.executable, "-m", "bench.bench_docx", "--worker", extractor, path],
+		cwd=ROOT, capture_output=True, text=True, check=True,
+	)
+	return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None) -> int:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--paragraphs", type=int, default=5000)
+	parser.add_argument("--table-rows", type=int, default=2000)
+	parser.add_argument("--worker", nargs=2, metavar=("EXTRACTOR", "PATH"), help=argparse.SUPPRESS)
+	args = parser.parse_args(argv)
+	if args.worker:
+		_run_one(*args.worker)
+		return 0
+
+	rng = random.Random(0)
+	vocabulary = make_vocabulary(5000)
+	paragraphs = [" ".join(make_sentence(rng, vocabulary) for _ in range(4)) for _ in range(args.paragraphs)]
+	table = [[make_sentence(rng, vocabulary) for _ in range(4)] for _ in range(args.table_rows)]
+	cases = {
+		f"{args.paragraphs} paragraphs": (paragraphs, []),
+		f"{args.paragraphs} paragraphs + {args.table_rows}x4 table": (paragraphs, [table]),
+	}
+	for name, (paragraphs, tables) in cases.items():
+		with tempfile.NamedTemporaryFile(suffix=".docx", delete=False) as fh:
+			fh.write(make_docx(paragraphs, tables))
+			path = fh.name
+		try:
+			print(f"{name} ({os.path.getsize(path) / 1024:.0f} KB)", flush=True)
+			for extractor in EXTRACTORS:
+				r = _measure(extractor, path)
+				print(f"    {extractor:12} {r['ms']:9.1f} ms   peak RSS +{r['rss_kb'] / 1024:7.1f} MB   "
+					  f"{r['pieces']:7d} pieces {r['chars']:10d} chars", flush=True)
+		finally:
+			os.unlink(path)
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,38 @@
+"""Microbenchmark: re-generating a 100-question quiz on the same document.
+
+Compares the first request (which builds and caches the question pool) with
+warm requests that only sample it, keyed by text hash and by doc_id.
+
+	python -m bench.bench_question_pool
+"""
+import time
+
+from bench.corpus import make_text
+from utils.cache import sha256_hex
+from utils.quizgen import _pools, generate_quiz
+
+
+def _best(fn, repeats: int) -> float:
+	best = float("inf")
+	for _ in range(repeats):
+		start = time.perf_counter()
+		fn()
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+def main(size_bytes: int = 1_000_000, questions: int = 100, repeats: int = 50) -> None:
+	text = make_text(size_bytes)
+	doc_id = sha256_hex(text)[:32]
+	print(f"text: {len(text)} bytes, {questions} questions")
+	for mode in ("mcq", "tf", "mixed"):
+		_pools.clear()
+		cold = _best(lambda: generate_quiz(text, questions, mode), 1)
+		by_hash = _best(lambda: generate_quiz(text, questions, mode), repeats)
+		by_id = _best(lambda: generate_quiz(text, questions, mode, key=doc_id), repeats)
+		print(f"{mode:6} cold {cold * 1e3:9.2f} ms   warm (text hash) {by_hash * 1e3:7.3f} ms   "
+			  f"warm (doc_id) {by_id * 1e3:7.3f} ms")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,80 @@
+"""Benchmark: cold-start import time of the app entry points, from ``python -X importtime``.
+
+Each entry point is imported in a fresh interpreter several times; the median
+cumulative import time is reported with the heaviest modules, and heavy SDKs
+or parsers that were imported eagerly are flagged.
+
+	python -m bench.bench_startup
+	python -m bench.bench_startup --budget-ms 400   # exit 1 if an entry point is slower
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINTS = ("app", "api.index", "asgi")
+# Loaded on first use; importing any of them at startup is a regression
+LAZY_MODULES = ("openai", "google.generativeai", "PyPDF2", "docx", "numpy")
+
+_line_pattern = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_profile(module: str) -> Tuple[int, List[Tuple[int, int, str]], List[str]]:
+	"""Cumulative microseconds for ``module``, per-module (self, cumulative, name) rows, and lazy modules loaded."""
+	probe = f"import sys, {module}; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+	result = subprocess.run(
+		[sys.executable, "-X", "importtime", "-c", probe],
+		cwd=ROOT, capture_output=True, text=True, check=True,
+	)
+	rows = []
+	total = 0
+	for line in result.stderr.splitlines():
+		match = _line_pattern.match(line)
+		if not match:
+			continue
+		self_us, cumulative_us, _, name = match.groups()
+		rows.append((int(self_us), int(cumulative_us), name))
+		if name == module:
+			total = int(cumulative_us)
+	loaded = [m for m in result.stdout.strip().split(",") if m]
+	return total, rows, loaded
+
+
+def main(argv=None) -> int:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--runs", type=int, default=5)
+	parser.add_argument("--top", type=int, default=8, help="heaviest modules to list")
+	parser.add_argument("--budget-ms", type=float, default=0.0, help="fail if the median exceeds this (0 = off)")
+	args = parser.parse_args(argv)
+
+	failed = False
+	for module in ENTRY_POINTS:
+		totals = []
+		rows: List[Tuple[int, int, str]] = []
+		loaded: List[str] = []
+		for _ in range(args.runs):
+			total, rows, loaded = import_profile(module)
+			totals.append(total)
+		median_ms = statistics.median(totals) / 1e3
+		print(f"{module:10} median {median_ms:8.1f} ms over {args.runs} runs")
+		by_package: Dict[str, int] = {}
+		for self_us, _, name in rows:
+			top = name.split(".")[0]
+			by_package[top] = by_package.get(top, 0) + self_us
+		for name, us in sorted(by_package.items(), key=lambda item: -item[1])[:args.top]:
+			print(f"    {name:28} {us / 1e3:8.1f} ms")
+		if loaded:
+			print(f"    eagerly imported: {', '.join(loaded)}")
+			failed = True
+		if args.budget_ms and median_ms > args.budget_ms:
+			print(f"    over budget ({args.budget_ms:.0f} ms)")
+			failed = True
+	return 1 if failed else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
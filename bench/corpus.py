@@ -0,0 +1,151 @@
+"""Synthetic study-text and document fixtures shared by the benchmark scripts."""
+import io
+import random
+import zipfile
+from typing import List
+from xml.sax.saxutils import escape
+
+_SUBJECTS = [
+	"photosynthesis", "mitochondria", "chloroplast", "enzyme", "membrane", "nucleus",
+	"protein", "ribosome", "glucose", "respiration", "osmosis", "diffusion", "cellulose",
+	"chromosome", "genome", "mutation", "evolution", "ecosystem", "predator", "nitrogen",
+	"carbon", "oxygen", "hydrogen", "molecule", "catalyst", "reaction", "equilibrium",
+	"velocity", "acceleration", "momentum", "friction", "gravity", "electron", "neutron",
+	"isotope", "radiation", "frequency", "wavelength", "amplitude", "resistance",
+	"parliament", "constitution", "revolution", "empire", "treaty", "economy", "inflation",
+	"currency", "taxation", "agriculture", "industry", "migration", "population", "climate",
+]
+_VERBS = [
+	"produces", "regulates", "transports", "converts", "stores", "releases", "controls",
+	"absorbs", "increases", "reduces", "depends on", "interacts with", "is part of",
+]
+_FILLERS = [
+	"during the process", "in most organisms", "under normal conditions", "over long periods",
+	"in the laboratory", "according to the theory", "within the system", "at high temperature",
+]
+
+
+_SYLLABLES = ["ka", "lo", "mi", "ter", "van", "dro", "pel", "six", "qua", "nor", "bel", "tri", "zen", "hop"]
+
+
+def make_vocabulary(size: int, seed: int = 0) -> list:
+	"""Known subject terms followed by made-up terms, so textbook-sized vocabularies exist."""
+	rng = random.Random(seed)
+	words = list(_SUBJECTS)
+	seen = set(words)
+	while len(words) < size:
+		word = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4)))
+		if word not in seen:
+			seen.add(word)
+			words.append(word)
+	return words
+
+
+def make_sentence(rng: random.Random, vocabulary: list = _SUBJECTS) -> str:
+	# Skewed choice gives a Zipf-like frequency distribution
+	def term() -> str:
+		return vocabulary[int(len(vocabulary) * rng.random() ** 3)]
+
+	sentence = f"The {term()} {rng.choice(_VERBS)} the {term()}"
+	if rng.random() < 0.6:
+		sentence += " " + rng.choice(_FILLERS)
+	if rng.random() < 0.3:
+		sentence += f" and the {term()} {rng.choice(_VERBS)} {term()}"
+	return sentence + "."
+
+
+def make_text(size_bytes: int, seed: int = 0, vocabulary_size: int = 5000) -> str:
+	"""Return roughly ``size_bytes`` of sentence-structured text."""
+	rng = random.Random(seed)
+	vocabulary = make_vocabulary(vocabulary_size, seed)
+	parts = []
+	total = 0
+	while total < size_bytes:
+		sentence = make_sentence(rng, vocabulary)
+		parts.append(sentence)
+		total += len(sentence) + 1
+	return " ".join(parts)
+
+
+def make_pdf(pages: List[str], line_chars: int = 90) -> bytes:
+	"""Minimal uncompressed PDF with one Helvetica text page per entry in ``pages``."""
+	objects: List[bytes] = []
+
+	def add(obj: bytes) -> int:
+		objects.append(obj)
+		return len(objects)
+
+	font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+	pages_id = add(b"")  # filled in once the kids are known
+	kids = []
+	for text in pages:
+		lines = [text[i:i + line_chars] for i in range(0, len(text), line_chars)]
+		shown = " ".join(
+			"(%s) '" % line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in lines
+		)
+		stream = f"BT /F1 10 Tf 40 800 Td 12 TL {shown} ET".encode("latin-1", errors="replace")
+		content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+		kids.append(add(
+			b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] "
+			b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font, content)
+		))
+	objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+		b" ".join(b"%d 0 R" % k for k in kids), len(kids)
+	)
+	catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+	out = bytearray(b"%PDF-1.4\n")
+	offsets = []
+	for number, obj in enumerate(objects, 1):
+		offsets.append(len(out))
+		out += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+	xref = len(out)
+	out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+	out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+	out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+	return bytes(out)
+
+
+_DOCX_CONTENT_TYPES = (
+	'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+	'<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+	'<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+	'<Default Extension="xml" ContentType="application/xml"/>'
+	'<Override PartName="/word/document.xml" '
+	'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+	'</Types>'
+)
+_DOCX_RELS = (
+	'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+	'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+	'<Relationship Id="rId1" '
+	'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+	'Target="word/document.xml"/>'
+	'</Relationships>'
+)
+_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def _docx_paragraph(text: str) -> str:
+	return f"<w:p><w:r><w:t xml:space=\"preserve\">{escape(text)}</w:t></w:r></w:p>"
+
+
+def make_docx(paragraphs: List[str], tables: List[List[List[str]]] = ()) -> bytes:
+	"""Minimal DOCX with the given paragraphs followed by tables (rows of cell texts)."""
+	body = [_docx_paragraph(p) for p in paragraphs]
+	for table in tables:
+		rows = "".join(
+			"<w:tr>" + "".join(f"<w:tc>{_docx_paragraph(cell)}</w:tc>" for cell in row) + "</w:tr>"
+			for row in table
+		)
+		body.append(f"<w:tbl>{rows}</w:tbl>")
+	document = (
+		'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+		f'<w:document xmlns:w="{_W_NS}"><w:body>{"".join(body)}</w:body></w:document>'
+	)
+	buffer = io.BytesIO()
+	with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+		zf.writestr("[Content_Types].xml", _DOCX_CONTENT_TYPES)
+		zf.writestr("_rels/.rels", _DOCX_RELS)
+		zf.writestr("word/document.xml", document)
+	return buffer.getvalue()
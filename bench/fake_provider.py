@@ -0,0 +1,200 @@
+"""Local OpenAI-compatible stub for benchmarking the AI path without a real provider.
+
+Serves ``POST /v1/chat/completions`` with a JSON array of quiz questions and
+keeps connections alive (HTTP/1.1), like a real provider behind a load balancer.
+
+	python -m bench.fake_provider --port 8765 --latency 0.05
+
+``--error-rate`` answers that fraction of requests with ``--error-status``
+(429 by default) and ``--slow-rate``/``--slow-latency`` add a latency tail, for
+exercising the retry and hedging policy in ``utils.ai_policy``. Tests set
+``fail_next``/``slow_next`` instead, to fail or delay exactly the next N
+requests, and read ``requests`` for how many arrived.
+
+then point the app at it with ``AI_API_KEY=test AI_BASE_URL=http://127.0.0.1:8765/v1``.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+
+_count_pattern = re.compile(r"Total questions: (\d+)")
+_WORDS = [
+	"enzyme", "glucose", "membrane", "nucleus", "protein", "osmosis", "climate", "treaty", "empire", "inflation",
+	"velocity", "gravity", "electron", "isotope", "genome", "mutation", "predator", "nitrogen", "catalyst", "currency",
+]
+
+
+def fake_questions(prompt: str) -> list:
+	match = _count_pattern.search(prompt)
+	count = int(match.group(1)) if match else 5
+	tag = zlib.crc32(prompt.encode("utf-8"))  # distinct questions per distinct prompt
+	# Distinct wording per question, so near-duplicate filtering keeps them all
+	rng = random.Random(tag)
+	return [
+		{
+			"question": f"Which statement about the {' '.join(rng.sample(_WORDS, 4))} ({tag}-{i}) is correct?",
+			"options": ["Alpha", "Beta", "Gamma", "Delta"],
+			"answer_index": i % 4,
+			"type": "mcq",
+		}
+		for i in range(count)
+	]
+
+
+class _Handler(BaseHTTPRequestHandler):
+	protocol_version = "HTTP/1.1"
+	disable_nagle_algorithm = True
+
+	def log_message(self, format, *args):  # keep benchmark output clean
+		pass
+
+	def do_POST(self):
+		length = int(self.headers.get("Content-Length") or 0)
+		body = json.loads(self.rfile.read(length) or b"{}")
+		prompt = body.get("messages", [{}])[-1].get("content", "")
+		content = json.dumps(fake_questions(prompt))
+		if self._inject_failure():
+			return
+		if body.get("stream"):
+			self._stream(body, content)
+			return
+		if self.server.latency:
+			time.sleep(self.server.latency)
+		payload = json.dumps({
+			"id": "chatcmpl-fake",
+			"object": "chat.completion",
+			"created": int(time.time()),
+			"model": body.get("model", "fake"),
+			"choices": [{
+				"index": 0,
+				"finish_reason": "stop",
+				"message": {"role": "assistant", "content": content},
+			}],
+			"usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+		}).encode("utf-8")
+		self.send_response(200)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(payload)))
+		self.end_headers()
+		self.wfile.write(payload)
+
+	def _inject_failure(self) -> bool:
+		server = self.server
+		with server.rng_lock:
+			server.requests += 1
+			fail = server.rng.random() < server.error_rate or server.fail_next > 0
+			slow = server.rng.random() < server.slow_rate or server.slow_next > 0
+			server.fail_next = max(0, server.fail_next - 1)
+			server.slow_next = max(0, server.slow_next - 1)
+		if slow:
+			time.sleep(server.slow_latency)
+		if not fail:
+			return False
+		server.errors += 1
+		payload = json.dumps({"error": {"message": "injected failure", "type": "server_error"}}).encode("utf-8")
+		self.send_response(server.error_status)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(payload)))
+		self.end_headers()
+		self.wfile.write(payload)
+		return True
+
+	def _stream(self, body: dict, content: str, pieces: int = 20) -> None:
+		# Server-sent chunks over chunked transfer encoding; latency is spread across pieces
+		self.send_response(200)
+		self.send_header("Content-Type", "text/event-stream")
+		self.send_header("Transfer-Encoding", "chunked")
+		self.end_headers()
+		step = max(1, -(-len(content) // pieces))
+		for i in range(0, len(content), step):
+			if self.server.latency:
+				time.sleep(self.server.latency / pieces)
+			event = {
+				"id": "chatcmpl-fake",
+				"object": "chat.completion.chunk",
+				"created": int(time.time()),
+				"model": body.get("model", "fake"),
+				"choices": [{"index": 0, "delta": {"content": content[i:i + step]}, "finish_reason": None}],
+			}
+			self._write_chunk(f"data: {json.dumps(event)}\n\n")
+		self._write_chunk("data: [DONE]\n\n")
+		self.wfile.write(b"0\r\n\r\n")
+
+	def _write_chunk(self, text: str) -> None:
+		data = text.encode("utf-8")
+		self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+
+class FakeProvider(ThreadingHTTPServer):
+	daemon_threads = True
+	# Room for hundreds of clients connecting at once (the socketserver default is 5)
+	request_queue_size = 1024
+
+	def __init__(
+		self,
+		address: Tuple[str, int] = ("127.0.0.1", 0),
+		latency: float = 0.0,
+		error_rate: float = 0.0,
+		error_status: int = 429,
+		slow_rate: float = 0.0,
+		slow_latency: float = 0.0,
+		seed: int = 0,
+	):
+		super().__init__(address, _Handler)
+		self.latency = latency
+		self.error_rate = error_rate
+		self.error_status = error_status
+		self.slow_rate = slow_rate
+		self.slow_latency = slow_latency
+		self.errors = 0
+		self.requests = 0
+		self.fail_next = 0
+		self.slow_next = 0
+		self.rng = random.Random(seed)
+		self.rng_lock = threading.Lock()
+		self._thread: Optional[threading.Thread] = None
+
+	@property
+	def base_url(self) -> str:
+		host, port = self.server_address[:2]
+		return f"http://{host}:{port}/v1"
+
+	def start(self) -> "FakeProvider":
+		self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+		self._thread.start()
+		return self
+
+	def stop(self) -> None:
+		self.shutdown()
+		self.server_close()
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--port", type=int, default=8765)
+	parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+	parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+	parser.add_argument("--error-status", type=int, default=429, help="HTTP status of injected failures")
+	parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of requests that are slow")
+	parser.add_argument("--slow-latency", type=float, default=0.0, help="extra seconds for slow requests")
+	args = parser.parse_args()
+	server = FakeProvider(
+		("127.0.0.1", args.port),
+		latency=args.latency,
+		error_rate=args.error_rate,
+		error_status=args.error_status,
+		slow_rate=args.slow_rate,
+		slow_latency=args.slow_latency,
+	)
+	print(f"fake provider listening on {server.base_url}")
+	server.serve_forever()
+
+
+if __name__ == "__main__":
+	main()
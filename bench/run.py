@@ -0,0 +1,232 @@
+"""Benchmark harness for the extract -> quizgen -> ai_quiz pipeline.
+
+Generates fixture corpora in memory (TXT, multi-page PDF, large DOCX), times
+each stage, and writes throughput, p50/p95 latency and peak memory to JSON.
+Optionally compares against a saved baseline.
+
+	python -m bench.run                                   # write bench/results.json
+	python -m bench.run --save-baseline                   # also copy to bench/baseline.json
+	python -m bench.run --baseline bench/baseline.json    # compare, exit 1 on regression
+	python -m bench.run --quick --only quizgen            # fewer repeats, one stage
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+# Measure raw work, not cache hits
+os.environ["EXTRACT_CACHE_ENTRIES"] = "0"
+os.environ.pop("EXTRACT_CACHE_DIR", None)
+os.environ["AI_CACHE_MAX_ENTRIES"] = "0"
+os.environ["QUIZ_POOL_CACHE_ENTRIES"] = "0"
+
+from werkzeug.datastructures import FileStorage  # noqa: E402
+
+from bench.corpus import make_docx, make_pdf, make_text  # noqa: E402
+from bench.bench_startup import ENTRY_POINTS, ROOT  # noqa: E402
+from bench.fake_provider import FakeProvider  # noqa: E402
+from utils import ai_quiz  # noqa: E402
+from utils.dedup import dedupe_questions  # noqa: E402
+from utils.extract import extract_text_from_upload  # noqa: E402
+from utils.quizgen import generate_quiz  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS = os.path.join(HERE, "results.json")
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+
+TEXT_SIZES = {"small": 10_000, "medium": 200_000, "large": 2_000_000}
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+	ordered = sorted(samples)
+	return ordered[min(len(ordered) - 1, int(round((len(ordered) - 1) * pct)))]
+
+
+def _print_result(name: str, r: Dict) -> None:
+	print(f"{name:34} p50 {r['p50_ms']:9.2f} ms  p95 {r['p95_ms']:9.2f} ms  "
+		  f"{r['throughput']:10.1f} {r['throughput_unit']:13} peak {r['peak_mem_kb']:9.0f} KB", flush=True)
+
+
+def measure(name: str, fn: Callable[[], object], repeats: int, units: float, unit: str) -> Dict:
+	"""Time ``fn`` ``repeats`` times, then run it once more under tracemalloc for peak memory."""
+	fn()  # warm-up
+	samples = []
+	for _ in range(repeats):
+		start = time.perf_counter()
+		fn()
+		samples.append(time.perf_counter() - start)
+	tracemalloc.start()
+	try:
+		fn()
+		_, peak = tracemalloc.get_traced_memory()
+	finally:
+		tracemalloc.stop()
+	p50 = statistics.median(samples)
+	result = {
+		"p50_ms": p50 * 1e3,
+		"p95_ms": _percentile(samples, 0.95) * 1e3,
+		"throughput": units / p50 if p50 else 0.0,
+		"throughput_unit": f"{unit}/s",
+		"peak_mem_kb": peak / 1024,
+		"repeats": repeats,
+	}
+	_print_result(name, result)
+	return result
+
+
+def _upload(data: bytes, filename: str) -> Callable[[], object]:
+	return lambda: extract_text_from_upload(FileStorage(io.BytesIO(data), filename=filename))
+
+
+def bench_extract(repeats: int) -> Dict[str, Dict]:
+	results = {}
+	for name, size in TEXT_SIZES.items():
+		data = make_text(size).encode("utf-8")
+		key = f"extract/txt/{name}"
+		results[key] = measure(key, _upload(data, "doc.txt"), repeats, len(data) / 1e6, "MB")
+	for pages in (20, 200):
+		data = make_pdf([make_text(3000, seed=i) for i in range(pages)])
+		key = f"extract/pdf/{pages}p"
+		results[key] = measure(key, _upload(data, "doc.pdf"), repeats, pages, "pages")
+	for paragraphs in (2000, 10000):
+		texts = [make_text(200, seed=i) for i in range(paragraphs)]
+		tables = [[[f"cell {r}-{c}" for c in range(4)] for r in range(250)]]
+		data = make_docx(texts, tables)
+		key = f"extract/docx/{paragraphs}para"
+		results[key] = measure(key, _upload(data, "doc.docx"), repeats, paragraphs, "paragraphs")
+	return results
+
+
+def bench_quizgen(repeats: int) -> Dict[str, Dict]:
+	results = {}
+	for name, size in TEXT_SIZES.items():
+		text = make_text(size)
+		for mode in ("mcq", "tf", "mixed"):
+			key = f"quizgen/{mode}/{name}"
+			results[key] = measure(
+				key, lambda: generate_quiz(text, num_questions=100, mode=mode), repeats, len(text) / 1e6, "MB"
+			)
+	return results
+
+
+def bench_startup(repeats: int) -> Dict[str, Dict]:
+	results = {}
+	for module in ENTRY_POINTS:
+		key = f"startup/{module}"
+		command = [sys.executable, "-c", f"import {module}"]
+		results[key] = measure(
+			key, lambda: subprocess.run(command, cwd=ROOT, check=True), repeats, 1, "cold starts"
+		)
+	return results
+
+
+def bench_dedup(repeats: int) -> Dict[str, Dict]:
+	results = {}
+	text = make_text(TEXT_SIZES["medium"])
+	pool = generate_quiz(text, num_questions=500, mode="mcq") + generate_quiz(text, num_questions=500, mode="tf")
+	for count in (100, 500, 1000):
+		candidates = pool[:count]
+		key = f"dedup/{count}"
+		results[key] = measure(key, lambda: dedupe_questions(candidates), repeats, count, "questions")
+	return results
+
+
+def bench_ai(repeats: int, latency: float) -> Dict[str, Dict]:
+	server = FakeProvider(latency=latency).start()
+	saved = {k: os.environ.get(k) for k in ("AI_API_KEY", "AI_BASE_URL", "AI_PROVIDER", "GOOGLE_API_KEY")}
+	os.environ.update({"AI_API_KEY": "bench", "AI_BASE_URL": server.base_url, "AI_PROVIDER": "openai"})
+	os.environ.pop("GOOGLE_API_KEY", None)
+	results = {}
+	try:
+		for name, size in (("small", TEXT_SIZES["small"]), ("large", 200_000)):
+			text = make_text(size)
+			key = f"ai/mcq/{name}"
+			results[key] = measure(
+				key, lambda: ai_quiz.generate_quiz_ai(text, num_questions=20, mode="mcq", use_cache=False),
+				repeats, 20, "questions",
+			)
+	finally:
+		server.stop()
+		for key, value in saved.items():
+			if value is None:
+				os.environ.pop(key, None)
+			else:
+				os.environ[key] = value
+	return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+	"""Print a p50 comparison table and return the names of cases slower than ``threshold``."""
+	regressions = []
+	print(f"\n{'case':34} {'baseline ms':>12} {'current ms':>12} {'change':>8}")
+	for name, current in results.items():
+		base = baseline.get(name)
+		if not base:
+			print(f"{name:34} {'-':>12} {current['p50_ms']:12.2f} {'new':>8}")
+			continue
+		change = current["p50_ms"] / base["p50_ms"] - 1 if base["p50_ms"] else 0.0
+		flag = ""
+		if change > threshold:
+			regressions.append(name)
+			flag = "  REGRESSION"
+		print(f"{name:34} {base['p50_ms']:12.2f} {current['p50_ms']:12.2f} {change:+8.1%}{flag}")
+	return regressions
+
+
+def main(argv=None) -> int:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--output", default=DEFAULT_RESULTS, help="results JSON path")
+	parser.add_argument("--baseline", help="baseline JSON to compare against")
+	parser.add_argument("--save-baseline", action="store_true", help=f"also write results to {DEFAULT_BASELINE}")
+	parser.add_argument("--threshold", type=float, default=0.10, help="p50 slowdown that counts as a regression")
+	parser.add_argument("--repeats", type=int, default=7)
+	parser.add_argument("--quick", action="store_true", help="3 repeats")
+	parser.add_argument("--only", choices=("startup", "extract", "quizgen", "dedup", "ai"), action="append")
+	parser.add_argument("--ai-latency", type=float, default=0.02, help="fake provider latency in seconds")
+	args = parser.parse_args(argv)
+
+	repeats = 3 if args.quick else args.repeats
+	stages = args.only or ["startup", "extract", "quizgen", "dedup", "ai"]
+	results: Dict[str, Dict] = {}
+	if "startup" in stages:
+		results.update(bench_startup(repeats))
+	if "extract" in stages:
+		results.update(bench_extract(repeats))
+	if "quizgen" in stages:
+		results.update(bench_quizgen(repeats))
+	if "dedup" in stages:
+		results.update(bench_dedup(repeats))
+	if "ai" in stages:
+		results.update(bench_ai(repeats, args.ai_latency))
+
+	report = {
+		"meta": {
+			"python": platform.python_version(),
+			"platform": platform.platform(),
+			"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+		},
+		"results": results,
+	}
+	with open(args.output, "w", encoding="utf-8") as fh:
+		json.dump(report, fh, indent=2, sort_keys=True)
+	if args.save_baseline:
+		with open(DEFAULT_BASELINE, "w", encoding="utf-8") as fh:
+			json.dump(report, fh, indent=2, sort_keys=True)
+
+	if args.baseline:
+		with open(args.baseline, encoding="utf-8") as fh:
+			baseline = json.load(fh)["results"]
+		if compare(results, baseline, args.threshold):
+			return 1
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
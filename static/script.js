@@ -9,6 +9,38 @@ const genStatus = document.getElementById('genStatus');
 const quizContainer = document.getElementById('quizContainer');
 const showAnswersBtn = document.getElementById('showAnswersBtn');
 
+const docAttached = document.getElementById('docAttached');
+const docAttachedText = document.getElementById('docAttachedText');
+const detachBtn = document.getElementById('detachBtn');
+
+// Id of the last uploaded document. The server keeps its text and the textarea only shows
+// a preview, so the textarea is read-only until the document is detached.
+let currentDocId = null;
+let currentDocTruncated = false;
+
+function attachDocument(data) {
+	currentDocId = data.doc_id;
+	currentDocTruncated = !!data.truncated;
+	textInput.value = data.preview || '';
+	textInput.readOnly = true;
+	docAttachedText.textContent = currentDocTruncated
+		? `Quizzes use the whole uploaded document (${data.chars} characters); the box shows its beginning.`
+		: 'Quizzes use the uploaded document.';
+	docAttached.hidden = false;
+}
+
+function detachDocument() {
+	// A shortened preview is not the document, so it is not left behind as editable text
+	if (currentDocTruncated) textInput.value = '';
+	currentDocId = null;
+	currentDocTruncated = false;
+	textInput.readOnly = false;
+	docAttached.hidden = true;
+	textInput.focus();
+}
+
+detachBtn.addEventListener('click', detachDocument);
+
 uploadForm.addEventListener('submit', async (e) => {
 	e.preventDefault();
 	const fileInput = document.getElementById('fileInput');
@@ -23,67 +55,114 @@ uploadForm.addEventListener('submit', async (e) => {
 		const res = await fetch('/upload', { method: 'POST', body: formData });
 		const data = await res.json();
 		if (!res.ok) throw new Error(data.error || 'Upload failed');
-		textInput.value = data.text || '';
-		uploadStatus.textContent = 'Text extracted successfully.';
+		if (data.doc_id) attachDocument(data);
+		else detachDocument();
+		uploadStatus.textContent = data.truncated
+			? `Text extracted successfully (${data.chars} characters; showing the beginning).`
+			: 'Text extracted successfully.';
 	} catch (err) {
 		uploadStatus.textContent = 'Error: ' + err.message;
 	}
 });
 
+function appendQuestion(q, idx) {
+	const div = document.createElement('div');
+	div.className = 'question';
+	const title = document.createElement('h3');
+	title.textContent = `Q${idx + 1} (${q.type?.toUpperCase?.() || 'MCQ'}). ${q.question}`;
+	div.appendChild(title);
+	const meta = document.createElement('div');
+	meta.className = 'question-meta';
+	const mark = document.createElement('span');
+	mark.className = 'mark-badge mark-wrong';
+	mark.textContent = '0';
+	meta.appendChild(mark);
+	div.appendChild(meta);
+	q.options.forEach((opt, i) => {
+		const label = document.createElement('label');
+		label.className = 'option';
+		const input = document.createElement('input');
+		input.type = 'radio';
+		input.name = 'q' + idx;
+		input.value = i;
+		label.appendChild(input);
+		label.appendChild(document.createTextNode(' ' + opt));
+		div.appendChild(label);
+	});
+	quizContainer.appendChild(div);
+}
+
 function renderQuiz(questions) {
 	quizContainer.innerHTML = '';
-	questions.forEach((q, idx) => {
-		const div = document.createElement('div');
-		div.className = 'question';
-		const title = document.createElement('h3');
-		title.textContent = `Q${idx + 1} (${q.type?.toUpperCase?.() || 'MCQ'}). ${q.question}`;
-		div.appendChild(title);
-		const meta = document.createElement('div');
-		meta.className = 'question-meta';
-		const mark = document.createElement('span');
-		mark.className = 'mark-badge mark-wrong';
-		mark.textContent = '0';
-		meta.appendChild(mark);
-		div.appendChild(meta);
-		q.options.forEach((opt, i) => {
-			const label = document.createElement('label');
-			label.className = 'option';
-			const input = document.createElement('input');
-			input.type = 'radio';
-			input.name = 'q' + idx;
-			input.value = i;
-			label.appendChild(input);
-			label.appendChild(document.createTextNode(' ' + opt));
-			div.appendChild(label);
-		});
-		quizContainer.appendChild(div);
-	});
+	questions.forEach((q, idx) => appendQuestion(q, idx));
+}
+
+// Read a text/event-stream response body and call onEvent(name, data) per event
+async function readEvents(res, onEvent) {
+	const reader = res.body.getReader();
+	const decoder = new TextDecoder();
+	let buffer = '';
+	while (true) {
+		const { value, done } = await reader.read();
+		if (done) break;
+		buffer += decoder.decode(value, { stream: true });
+		let sep;
+		while ((sep = buffer.indexOf('\n\n')) !== -1) {
+			const frame = buffer.slice(0, sep);
+			buffer = buffer.slice(sep + 2);
+			let name = 'message';
+			let data = '';
+			frame.split('\n').forEach((line) => {
+				if (line.startsWith('event: ')) name = line.slice(7);
+				else if (line.startsWith('data: ')) data += line.slice(6);
+			});
+			if (data) onEvent(name, JSON.parse(data));
+		}
+	}
 }
 
 generateBtn.addEventListener('click', async () => {
 	const text = textInput.value.trim();
 	const numQuestions = parseInt(numQuestionsInput.value || '5', 10);
 	const mode = modeSelect.value;
-	if (!text) {
+	if (!text && !currentDocId) {
 		genStatus.textContent = 'Please paste text or extract from a file.';
 		return;
 	}
 	genStatus.textContent = 'Generating quiz...';
 	try {
-		const res = await fetch('/generate-quiz', {
+		// Questions are streamed and shown as soon as each one is generated
+		const res = await fetch('/generate-quiz/stream', {
 			method: 'POST',
 			headers: { 'Content-Type': 'application/json' },
-			body: JSON.stringify({ text, num_questions: numQuestions, mode, use_ai: !!useAICheck?.checked })
+			body: JSON.stringify({
+				...(currentDocId ? { doc_id: currentDocId } : { text }),
+				num_questions: numQuestions, mode, use_ai: !!useAICheck?.checked
+			})
+		});
+		if (!res.ok) {
+			const data = await res.json();
+			throw new Error(data.error || 'Failed to generate quiz');
+		}
+		const questions = [];
+		setCurrentQuestions(questions);
+		quizContainer.innerHTML = '';
+		const limit = Math.min(numQuestions, 100);
+		await readEvents(res, (event, data) => {
+			if (event === 'question' && questions.length < limit) {
+				questions.push(data);
+				appendQuestion(data, questions.length - 1);
+				genStatus.textContent = `Generating quiz... ${questions.length} / ${limit}`;
+			} else if (event === 'done') {
+				const meta = [];
+				if (data.used_ai) meta.push(`AI:${data.provider||'on'}`); else meta.push('heuristic');
+				if (data.fallback) meta.push('fallback');
+				if (data.ai_error) meta.push('ai_error');
+				genStatus.textContent = `Generated ${questions.length} question(s) • ${meta.join(' / ')}`;
+			} else if (event === 'error') {
+				throw new Error(data.error || 'Failed to generate quiz');
+			}
 		});
-		const data = await res.json();
-		if (!res.ok) throw new Error(data.error || 'Failed to generate quiz');
-		const questions = (data.questions || []).slice(0, Math.min(numQuestions, 100));
-		renderQuiz(questions);
-		const meta = [];
-		if (data.used_ai) meta.push(`AI:${data.provider||'on'}`); else meta.push('heuristic');
-		if (data.fallback) meta.push('fallback');
-		if (data.ai_error) meta.push('ai_error');
-		genStatus.textContent = `Generated ${questions.length} question(s) • ${meta.join(' / ')}`;
 	} catch (err) {
 		genStatus.textContent = 'Error: ' + err.message;
 	}
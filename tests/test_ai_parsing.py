@@ -0,0 +1,106 @@
+"""Regression tests for the streaming JSON scanner that pulls questions out of AI responses."""
+import json
+
+import pytest
+
+from utils.ai_quiz import _JSONObjectStream, _normalize_question, _parse_questions
+
+
+def _question(i: int, text: str = None) -> dict:
+	return {
+		"question": text or f"Which organelle is described in statement {i}?",
+		"options": ["Nucleus", "Ribosome", "Mitochondrion", "Golgi body"],
+		"answer_index": i % 4,
+		"type": "mcq",
+	}
+
+
+QUESTIONS = [_question(i) for i in range(3)]
+ARRAY = json.dumps(QUESTIONS, indent=2)
+
+
+def _feed(raw: str, size: int, validate=_normalize_question) -> list:
+	stream = _JSONObjectStream(validate)
+	items = []
+	for i in range(0, len(raw), size):
+		items.extend(stream.feed(raw[i:i + size]))
+	return items
+
+
+# Every case is also fed in small pieces, as a streamed completion arrives
+CHUNK_SIZES = [1, 2, 3, 7, 64, 1_000_000]
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_plain_array(size):
+	assert _feed(ARRAY, size) == QUESTIONS
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_truncated_output_keeps_finished_items(size):
+	# A reply cut off at max_tokens, in the middle of the third item
+	raw = ARRAY[:ARRAY.index('"answer_index"', ARRAY.index("statement 2"))]
+	assert _feed(raw, size) == QUESTIONS[:2]
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_fenced_output(size):
+	raw = "```json\n" + ARRAY + "\n```"
+	assert _feed(raw, size) == QUESTIONS
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_wrapped_in_object_yields_items_once(size):
+	raw = json.dumps({"questions": QUESTIONS})
+	assert _feed(raw, size) == QUESTIONS
+	# Without validation the enclosing object is still not returned a second time
+	assert _feed(raw, size, validate=None) == QUESTIONS
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_escapes_split_across_chunks(size):
+	# An escaped quote next to a brace: if the escape were missed, the brace would close the object early
+	tricky = _question(0, 'Is the "}" in {"powerhouse": 1} \\ of the cell {really} the mitochondrion?')
+	raw = json.dumps([tricky, QUESTIONS[1]])
+	assert _feed(raw, size) == [tricky, QUESTIONS[1]]
+
+
+def test_escape_split_exactly_after_backslash():
+	tricky = _question(0, 'Which word follows "\\"energy\\"" here?')
+	raw = json.dumps([tricky])
+	cut = raw.index("\\") + 1
+	stream = _JSONObjectStream(_normalize_question)
+	assert stream.feed(raw[:cut]) == []
+	assert stream.feed(raw[cut:]) == [tricky]
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_prose_with_quotes_and_stray_brace(size):
+	# An odd number of quotes in the prose must not flip the string state of the JSON that follows
+	raw = 'Measured on a 12" ruler, here are "your" questions { as requested:\n' + ARRAY + '\nLet me know if you want "more".'
+	assert _feed(raw, size) == QUESTIONS
+	braced = [_question(0, 'Is {x} in "set" {y}?'), QUESTIONS[1]]
+	raw = 'The 12" answer, with a stray { brace:\n' + json.dumps(braced)
+	assert _feed(raw, size) == braced
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_malformed_item_in_the_middle_is_skipped(size):
+	items = [json.dumps(QUESTIONS[0]), '{"question": "Broken", "options": ["a", "b",], "answer_index": 0}',
+		json.dumps(QUESTIONS[2])]
+	raw = "[" + ", ".join(items) + "]"
+	assert _feed(raw, size) == [QUESTIONS[0], QUESTIONS[2]]
+
+
+def test_schema_invalid_items_are_dropped():
+	bad = [
+		{"question": "", "options": ["a", "b"], "answer_index": 0},
+		{"question": "Out of range?", "options": ["a", "b"], "answer_index": 5},
+		{"question": "No options?", "answer_index": 0},
+	]
+	assert _parse_questions(json.dumps(bad + QUESTIONS)) == QUESTIONS
+
+
+def test_parse_questions_matches_streamed_parse():
+	raw = "Here you go:\n```json\n" + json.dumps({"questions": QUESTIONS}) + "\n```"
+	assert _parse_questions(raw) == _feed(raw, 5) == QUESTIONS
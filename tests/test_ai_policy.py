@@ -0,0 +1,125 @@
+"""Retry, timeout, hedging and provider failover of AI calls, against bench.fake_provider."""
+import asyncio
+import time
+
+import pytest
+
+from bench.fake_provider import FakeProvider
+from utils import ai_quiz
+from utils.ai_policy import CallPolicy
+
+PROMPT = ai_quiz._build_prompt("The enzyme converts glucose.", 3, "mcq")
+# Tiny backoff so retried tests stay fast
+RETRY = dict(max_retries=2, backoff_base=0.001, backoff_max=0.001, hedge_after=0)
+
+
+def _config(server: FakeProvider) -> dict:
+	return {"provider": "openai", "api_key": "test", "base_url": server.base_url, "headers": None, "model": "fake"}
+
+
+@pytest.fixture
+def server():
+	ai_quiz.reset_clients()
+	server = FakeProvider(latency=0.0, slow_latency=1.0).start()
+	yield server
+	server.stop()
+	ai_quiz.reset_clients()
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_transient_errors_are_retried(server, status):
+	server.error_status = status
+	server.fail_next = 2
+	text = ai_quiz._call_provider(PROMPT, _config(server), CallPolicy(**RETRY))
+	assert len(ai_quiz._parse_questions(text)) == 3
+	assert server.requests == 3
+
+
+def test_retries_stop_after_max_retries(server):
+	server.error_status = 429
+	server.fail_next = 10
+	with pytest.raises(Exception) as exc_info:
+		ai_quiz._call_provider(PROMPT, _config(server), CallPolicy(**RETRY))
+	assert getattr(exc_info.value, "status_code", None) == 429
+	assert server.requests == 3
+
+
+def test_client_errors_are_not_retried(server):
+	server.error_status = 400
+	server.fail_next = 1
+	with pytest.raises(Exception) as exc_info:
+		ai_quiz._call_provider(PROMPT, _config(server), CallPolicy(**RETRY))
+	assert getattr(exc_info.value, "status_code", None) == 400
+	assert server.requests == 1
+
+
+def test_policy_timeout_applies_per_request(server):
+	server.slow_next = 1
+	start = time.perf_counter()
+	with pytest.raises(Exception):
+		ai_quiz._call_provider(PROMPT, _config(server), CallPolicy(timeout=0.2, max_retries=0, hedge_after=0))
+	assert time.perf_counter() - start < 0.8
+
+
+def test_hedge_fires_after_hedge_after(server):
+	server.slow_next = 1
+	start = time.perf_counter()
+	text = ai_quiz._call_provider(PROMPT, _config(server), CallPolicy(max_retries=0, hedge_after=0.1))
+	elapsed = time.perf_counter() - start
+	assert ai_quiz._parse_questions(text)
+	assert server.requests == 2
+	assert 0.1 <= elapsed < 0.8
+
+
+def test_no_hedge_before_hedge_after(server):
+	ai_quiz._call_provider(PROMPT, _config(server), CallPolicy(max_retries=0, hedge_after=0.5))
+	assert server.requests == 1
+
+
+def test_async_retries_and_hedging(server):
+	server.error_status = 503
+	server.fail_next = 1
+	text = asyncio.run(ai_quiz._call_provider_async(PROMPT, _config(server), CallPolicy(**RETRY)))
+	assert ai_quiz._parse_questions(text)
+	assert server.requests == 2
+
+	server.slow_next = 1
+	start = time.perf_counter()
+	asyncio.run(ai_quiz._call_provider_async(PROMPT, _config(server), CallPolicy(max_retries=0, hedge_after=0.1)))
+	assert server.requests == 4
+	assert time.perf_counter() - start < 0.8
+
+
+@pytest.fixture
+def two_providers(server, monkeypatch):
+	"""AI_PROVIDER_CHAIN=openai,google, with each name pointed at its own fake server."""
+	backup = FakeProvider().start()
+	configs = {"openai": _config(server), "google": _config(backup)}
+	monkeypatch.setattr(ai_quiz, "AI_PROVIDER_CHAIN", ["openai", "google"])
+	monkeypatch.setattr(ai_quiz, "_provider_config", lambda model=None, provider=None: configs[provider])
+	yield server, backup
+	backup.stop()
+
+
+def test_provider_chain_fails_over(two_providers):
+	primary, backup = two_providers
+	primary.error_status = 400
+	primary.fail_next = 1
+	questions = ai_quiz.generate_quiz_ai("The enzyme converts glucose.", 3, use_cache=False, chunked=False)
+	assert len(questions) == 3
+	assert (primary.requests, backup.requests) == (1, 1)
+
+
+def test_provider_chain_prefers_the_first_provider(two_providers):
+	primary, backup = two_providers
+	assert ai_quiz.generate_quiz_ai("The enzyme converts glucose.", 3, use_cache=False, chunked=False)
+	assert (primary.requests, backup.requests) == (1, 0)
+
+
+def test_provider_chain_fails_over_async(two_providers):
+	primary, backup = two_providers
+	primary.error_status = 400
+	primary.fail_next = 1
+	questions = asyncio.run(ai_quiz.generate_quiz_ai_async("The enzyme converts glucose.", 3, use_cache=False, chunked=False))
+	assert len(questions) == 3
+	assert (primary.requests, backup.requests) == (1, 1)
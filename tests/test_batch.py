@@ -0,0 +1,60 @@
+"""Batch generation keeps working after its process pool breaks."""
+import os
+import signal
+import time
+
+import pytest
+
+from tests.test_quizgen import TEXT
+from utils import pipeline
+
+
+def _items(count: int) -> list:
+	return pipeline.parse_batch_payload({"items": [{"text": TEXT, "num_questions": 2, "seed": i} for i in range(count)]})
+
+
+def _kill_workers(pool) -> None:
+	# What the OOM killer does to a worker
+	for process in list(pool._processes.values()):
+		os.kill(process.pid, signal.SIGKILL)
+	for process in list(pool._processes.values()):
+		process.join(5)
+
+
+@pytest.fixture
+def process_pool(monkeypatch):
+	monkeypatch.setattr(pipeline, "BATCH_PROCESSES", 2)
+	yield
+	pool = pipeline._process_pool
+	if pool is not None:
+		pool.shutdown(wait=True)
+	pipeline._process_pool = None
+
+
+def _assert_ok(results: list, count: int) -> None:
+	assert len(results) == count
+	assert all("error" not in r and r["questions"] for r in results), results
+
+
+def test_batch_recovers_after_workers_are_killed(process_pool):
+	_assert_ok(pipeline.run_quiz_batch(_items(4)), 4)
+	broken = pipeline._process_pool
+	assert broken is not None
+
+	_kill_workers(broken)
+	time.sleep(0.2)  # let the executor notice
+	_assert_ok(pipeline.run_quiz_batch(_items(4)), 4)
+	assert pipeline._process_pool is not broken
+
+	# The replacement pool serves later batches
+	_assert_ok(pipeline.run_quiz_batch(_items(4)), 4)
+
+
+def test_batch_recovers_when_pool_breaks_before_it_notices(process_pool):
+	pipeline.run_quiz_batch(_items(2))
+	broken = pipeline._process_pool
+	_kill_workers(broken)
+	# No pause: the items may be submitted before the pool knows it is broken
+	_assert_ok(pipeline.run_quiz_batch(_items(6)), 6)
+	_assert_ok(pipeline.run_quiz_batch(_items(6)), 6)
+	assert pipeline._process_pool is not broken
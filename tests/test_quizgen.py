@@ -0,0 +1,37 @@
+"""Edge cases of the heuristic quiz generator."""
+import threading
+
+import pytest
+
+from utils.quizgen import generate_quiz, iter_quiz
+
+TEXT = (
+	"The mitochondria produces energy for the cell through respiration. "
+	"Photosynthesis converts sunlight into chemical energy in green plants. "
+	"The heart pumps blood through arteries and veins of the body. "
+	"Enzymes speed up chemical reactions inside living organisms. "
+	"Glucose is broken down during cellular respiration to release energy."
+)
+
+
+def _within(seconds: float, fn):
+	"""Run ``fn`` on a thread and fail instead of hanging if it does not return in time."""
+	result = {}
+	thread = threading.Thread(target=lambda: result.setdefault("value", fn()), daemon=True)
+	thread.start()
+	thread.join(seconds)
+	assert not thread.is_alive(), "quiz generation did not return"
+	return result["value"]
+
+
+@pytest.mark.parametrize("mode", ["mcq", "tf", "mixed", "unknown"])
+@pytest.mark.parametrize("num_questions", [-1, -5, 0])
+def test_non_positive_counts_return_no_questions(mode, num_questions):
+	assert _within(5, lambda: generate_quiz(TEXT, num_questions, mode)) == []
+	assert _within(5, lambda: list(iter_quiz(TEXT, num_questions, mode, seed=1))) == []
+
+
+@pytest.mark.parametrize("mode", ["mcq", "tf", "mixed"])
+def test_positive_counts_still_generate(mode):
+	questions = generate_quiz(TEXT, 3, mode, seed=2)
+	assert 0 < len(questions) <= 3
@@ -0,0 +1,50 @@
+"""Uploads Werkzeug has spooled to disk are read in place, not copied again."""
+import io
+
+import pytest
+
+from app import app
+from utils import extract
+
+LINE = "Photosynthesis converts light energy into chemical energy stored in glucose molecules.\n"
+
+
+@pytest.fixture
+def sources(monkeypatch):
+	seen = []
+	spool_upload = extract._spool_upload
+
+	def recording(file_storage, max_bytes):
+		source, digest = spool_upload(file_storage, max_bytes)
+		seen.append((file_storage.stream, source))
+		return source, digest
+
+	monkeypatch.setattr(extract, "_spool_upload", recording)
+	return seen
+
+
+def _upload(body: bytes):
+	client = app.test_client()
+	return client.post("/upload", data={"file": (io.BytesIO(body), "notes.txt")}, content_type="multipart/form-data")
+
+
+def test_large_upload_is_memory_mapped(sources):
+	# Over Werkzeug's 500 KB threshold, so the spool rolls over to a real file
+	body = (LINE * (600 * 1024 // len(LINE) + 1)).encode()
+	response = _upload(body)
+	assert response.status_code == 200, response.get_json()
+	assert response.get_json()["chars"] == len(body.decode().strip())
+
+	(stream, source), = sources
+	assert stream._rolled
+	assert isinstance(source, extract._MappedFile)
+
+
+def test_small_upload_is_copied(sources):
+	body = (LINE * 10).encode()
+	response = _upload(body)
+	assert response.status_code == 200, response.get_json()
+
+	(stream, source), = sources
+	assert not getattr(stream, "_rolled", True)
+	assert not isinstance(source, extract._MappedFile)
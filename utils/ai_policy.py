@@ -0,0 +1,153 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Per-attempt provider timeout, retries on transient errors, and optional hedging
+AI_TIMEOUT = float(os.environ.get("AI_TIMEOUT", "60") or 60)
+AI_MAX_RETRIES = int(os.environ.get("AI_MAX_RETRIES", "2") or 0)
+AI_BACKOFF_BASE = float(os.environ.get("AI_BACKOFF_BASE", "0.5") or 0.5)
+AI_BACKOFF_MAX = float(os.environ.get("AI_BACKOFF_MAX", "8") or 8)
+# Send a duplicate request if the first has not answered after this many seconds
+# (set it near the provider's p95 latency; 0 disables hedging)
+AI_HEDGE_AFTER = float(os.environ.get("AI_HEDGE_AFTER", "0") or 0)
+
+_RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+# SDK exception class names that mean "try again" without a status code
+_RETRYABLE_NAMES = {
+	"APITimeoutError", "APIConnectionError", "Timeout", "TimeoutError", "ConnectTimeout", "ReadTimeout",
+	"ConnectError", "RemoteProtocolError", "DeadlineExceeded", "ServiceUnavailable", "TooManyRequests",
+	"InternalServerError", "ResourceExhausted",
+}
+
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_lock = threading.Lock()
+
+
+class CallPolicy:
+	"""How a single provider request is timed out, retried and hedged."""
+
+	def __init__(
+		self,
+		timeout: float = AI_TIMEOUT,
+		max_retries: int = AI_MAX_RETRIES,
+		backoff_base: float = AI_BACKOFF_BASE,
+		backoff_max: float = AI_BACKOFF_MAX,
+		hedge_after: float = AI_HEDGE_AFTER,
+	):
+		self.timeout = timeout
+		self.max_retries = max_retries
+		self.backoff_base = backoff_base
+		self.backoff_max = backoff_max
+		self.hedge_after = hedge_after
+
+
+def is_retryable(exc: BaseException) -> bool:
+	"""True for rate limits, 5xx responses, timeouts and dropped connections."""
+	status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+	if isinstance(status, int):
+		return status in _RETRYABLE_STATUS
+	if isinstance(exc, (TimeoutError, ConnectionError)):
+		return True
+	return any(cls.__name__ in _RETRYABLE_NAMES for cls in type(exc).__mro__)
+
+
+def backoff_delay(attempt: int, policy: CallPolicy) -> float:
+	"""Exponential backoff with full jitter for retry number ``attempt`` (0-based)."""
+	return random.uniform(0, min(policy.backoff_max, policy.backoff_base * (2 ** attempt)))
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+	global _hedge_executor
+	with _hedge_lock:
+		if _hedge_executor is None:
+			_hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="ai-hedge")
+	return _hedge_executor
+
+
+def _reset_hedge_executor() -> None:
+	global _hedge_executor, _hedge_lock
+	_hedge_executor = None
+	_hedge_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+	os.register_at_fork(after_in_child=_reset_hedge_executor)
+
+
+def _hedged(fn: Callable[[], T], hedge_after: float) -> T:
+	"""Run ``fn``; if it is still running after ``hedge_after`` seconds, race a second copy."""
+	executor = _get_hedge_executor()
+	pending = {executor.submit(fn)}
+	done, pending = wait(pending, timeout=hedge_after)
+	if not done:
+		pending.add(executor.submit(fn))
+	error: Optional[BaseException] = None
+	while True:
+		for future in done:
+			if future.exception() is None:
+				for other in pending:
+					other.cancel()
+				return future.result()
+			error = future.exception()
+		if not pending:
+			raise error
+		done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+
+def call_with_policy(fn: Callable[[], T], policy: Optional[CallPolicy] = None) -> T:
+	"""Call ``fn`` with hedging and retry-with-backoff on retryable errors."""
+	policy = policy or CallPolicy()
+	attempt = 0
+	while True:
+		try:
+			if policy.hedge_after > 0:
+				return _hedged(fn, policy.hedge_after)
+			return fn()
+		except Exception as exc:
+			if attempt >= policy.max_retries or not is_retryable(exc):
+				raise
+			time.sleep(backoff_delay(attempt, policy))
+			attempt += 1
+
+
+async def _hedged_async(fn: Callable[[], Awaitable[T]], hedge_after: float) -> T:
+	"""Async ``_hedged``: the copies are tasks on the running loop instead of threads."""
+	pending = {asyncio.ensure_future(fn())}
+	done, pending = await asyncio.wait(pending, timeout=hedge_after)
+	if not done:
+		pending.add(asyncio.ensure_future(fn()))
+	error: Optional[BaseException] = None
+	try:
+		while True:
+			for task in done:
+				if task.exception() is None:
+					return task.result()
+				error = task.exception()
+			if not pending:
+				raise error
+			done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+	finally:
+		for task in pending:
+			task.cancel()
+
+
+async def call_with_policy_async(fn: Callable[[], Awaitable[T]], policy: Optional[CallPolicy] = None) -> T:
+	"""``call_with_policy`` for coroutine functions; backoff sleeps without blocking the event loop."""
+	policy = policy or CallPolicy()
+	attempt = 0
+	while True:
+		try:
+			if policy.hedge_after > 0:
+				return await _hedged_async(fn, policy.hedge_after)
+			return await fn()
+		except Exception as exc:
+			if attempt >= policy.max_retries or not is_retryable(exc):
+				raise
+			await asyncio.sleep(backoff_delay(attempt, policy))
+			attempt += 1
@@ -1,16 +1,51 @@
+import asyncio
 import json
 import os
-from typing import Dict, List
+import re
+import tempfile
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
 
-try:
-	from openai import OpenAI
-except Exception:  # pragma: no cover
-	OpenAI = None  # type: ignore
+from utils.ai_policy import AI_TIMEOUT, CallPolicy, call_with_policy, call_with_policy_async
+from utils.cache import SQLiteCache, sha256_hex
+from utils.dedup import NearDuplicateFilter, dedupe_questions
+from utils.lazy import optional_module
+from utils.metrics import AI_CALL_SECONDS, AI_PARSE_SECONDS, register_collector, stats_lines
 
-try:
-	import google.generativeai as genai
-except Exception:
-	genai = None  # type: ignore
+# Persistent response cache shared by all workers (AI_CACHE_MAX_ENTRIES=0 disables it)
+AI_CACHE_PATH = os.environ.get("AI_CACHE_PATH", "").strip() or os.path.join(tempfile.gettempdir(), "quiz_ai_cache.sqlite3")
+AI_CACHE_TTL = float(os.environ.get("AI_CACHE_TTL", "86400") or 0) or None
+AI_CACHE_MAX_ENTRIES = int(os.environ.get("AI_CACHE_MAX_ENTRIES", "1000") or 0)
+
+_ai_cache: Optional[SQLiteCache] = None
+_ai_cache_lock = threading.Lock()
+
+# Long texts are split into chunks of about this many tokens, generated concurrently
+AI_CHUNK_TOKENS = int(os.environ.get("AI_CHUNK_TOKENS", "3000") or 3000)
+AI_MAX_CONCURRENCY = int(os.environ.get("AI_MAX_CONCURRENCY", "4") or 1)
+# Rough token estimate used for chunk budgeting
+_CHARS_PER_TOKEN = 4
+
+_sentence_split = re.compile(r"(?<=[.!?])\s+")
+_question_key_pattern = re.compile(r"[^a-z0-9]+")
+
+# Providers tried in order until one answers, e.g. "openai,google,heuristic".
+# "heuristic" (or the end of the chain) hands over to the caller's heuristic fallback.
+AI_PROVIDER_CHAIN = [p.strip().lower() for p in (os.environ.get("AI_PROVIDER_CHAIN") or "").split(",") if p.strip()]
+
+# Characters that change the JSON scanner's state outside and inside strings
+_json_token = re.compile(r'[{}"]')
+_string_token = re.compile(r'["\\]')
+
+# Provider clients reused across requests so HTTP connections stay alive
+_clients: Dict[Tuple, object] = {}
+_clients_lock = threading.Lock()
+# Async clients hold connections bound to one event loop, so each loop gets its own
+_async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
 
 
 def _build_prompt(text: str, num_questions: int, mode: str) -> str:
@@ -49,111 +84,712 @@ def _build_prompt(text: str, num_questions: int, mode: str) -> str:
 	)
 
 
-def _coerce_questions(raw: str) -> List[Dict]:
-	# Try to parse raw JSON or extract from fences
-	try:
-		return json.loads(raw)
-	except Exception:
-		pass
-	# Try extracting the largest JSON array
-	start = raw.find("[")
-	end = raw.rfind("]")
-	if start != -1 and end != -1 and end > start:
-		candidate = raw[start : end + 1]
+class _JSONObjectStream:
+	"""Pulls complete JSON objects out of text that arrives in pieces.
+
+	Works the same on streamed chunks and on a whole response: each object is
+	parsed once, as soon as its closing brace arrives, so a reply cut off at
+	``max_tokens`` or wrapped in fences/prose still yields every finished item.
+	Objects that fail to parse are skipped. With ``validate``, each object is
+	passed through it and dropped on ``None``; an object enclosing an accepted
+	one (e.g. ``{"questions": [...]}``) is not returned again.
+	"""
+
+	def __init__(self, validate: Optional[Callable[[Dict], Optional[Dict]]] = None):
+		self._validate = validate
+		self._text = ""
+		self._pos = 0
+		self._starts: List[int] = []
+		self._accepted_child: List[bool] = []
+		self._in_string = False
+
+	def feed(self, chunk: str) -> List[Dict]:
+		items: List[Dict] = []
+		text = self._text + chunk
+		pos = self._pos
+		starts = self._starts
+		accepted_child = self._accepted_child
+		while True:
+			match = (_string_token if self._in_string else _json_token).search(text, pos)
+			if match is None:
+				pos = len(text) if pos < len(text) else pos
+				break
+			ch = match.group()
+			pos = match.end()
+			if self._in_string:
+				if ch == "\\":
+					pos += 1  # skip the escaped character, even if it is in the next chunk
+				else:
+					self._in_string = False
+			elif ch == '"':
+				# Quotes outside any object are prose, not JSON strings
+				self._in_string = bool(starts)
+			elif ch == "{":
+				starts.append(match.start())
+				accepted_child.append(False)
+			elif starts:
+				start = starts.pop()
+				if accepted_child.pop():
+					if accepted_child:
+						accepted_child[-1] = True
+					continue
+				item = self._accept(text[start:pos])
+				if item is not None:
+					items.append(item)
+					if accepted_child:
+						accepted_child[-1] = True
+		if starts or pos > len(text):
+			self._text, self._pos = text, pos
+		else:
+			self._text, self._pos = "", 0
+		return items
+
+	def _accept(self, raw: str) -> Optional[Dict]:
 		try:
-			return json.loads(candidate)
-		except Exception:
-			pass
-	return []
+			item = json.loads(raw)
+		except ValueError:
+			return None
+		if not isinstance(item, dict):
+			return None
+		return self._validate(item) if self._validate else item
 
 
-def generate_quiz_ai(text: str, num_questions: int, mode: str = "mcq", model: str | None = None) -> List[Dict]:
-	provider = (os.environ.get("AI_PROVIDER") or "").strip().lower()
-	use_google = provider == "google" or bool(os.environ.get("GOOGLE_API_KEY"))
+def _parse_questions(raw: str) -> List[Dict]:
+	"""Every well-formed, schema-valid question in a complete provider response."""
+	with AI_PARSE_SECONDS.time():
+		return _JSONObjectStream(_normalize_question).feed(raw)
 
-	prompt = _build_prompt(text, num_questions, mode)
 
+def _model_for(provider: str, model: Optional[str], default: str) -> str:
+	return (model or os.environ.get(f"AI_MODEL_{provider.upper()}") or os.environ.get("AI_MODEL") or default).strip()
+
+
+def _provider_config(model: Optional[str] = None, provider: Optional[str] = None) -> Dict:
+	"""Resolve provider, credentials and model from the environment.
+
+	``provider`` ("openai" or "google") overrides the AI_PROVIDER/GOOGLE_API_KEY detection.
+	"""
+	if provider is None:
+		provider = (os.environ.get("AI_PROVIDER") or "").strip().lower()
+		use_google = provider == "google" or bool(os.environ.get("GOOGLE_API_KEY"))
+	else:
+		use_google = provider == "google"
+
+	# The SDKs take hundreds of milliseconds to import, so they load on the first AI request
 	if use_google:
-		if not genai:
+		if optional_module("google.generativeai") is None:
 			raise RuntimeError("Google Generative AI SDK not available. Install 'google-generativeai'.")
 		google_key = (os.environ.get("AI_API_KEY") or os.environ.get("GOOGLE_API_KEY") or "").strip()
 		if not google_key:
 			raise RuntimeError("GOOGLE_API_KEY/AI_API_KEY is not set.")
-		genai.configure(api_key=google_key)
-		google_model = (model or os.environ.get("AI_MODEL") or "gemini-1.5-flash").strip()
-		response = genai.GenerativeModel(google_model).generate_content(prompt)
-		content = getattr(response, "text", "") or ""
-		items = _coerce_questions(content)
-	else:
-		if not OpenAI:
-			raise RuntimeError("OpenAI SDK not available. Install 'openai'.")
-		# Flexible OpenAI-compatible config
-		api_key = (
-			os.environ.get("AI_API_KEY")
-			or os.environ.get("OPENAI_API_KEY")
-			or ""
-		).strip()
-		if not api_key:
-			raise RuntimeError("AI_API_KEY/OPENAI_API_KEY is not set.")
-		base_url = os.environ.get("AI_BASE_URL", "").strip() or None
-		openai_model = (model or os.environ.get("AI_MODEL") or "gpt-4o-mini").strip()
-		default_headers = None
-		if base_url and "openrouter.ai" in base_url:
-			default_headers = {
-				"HTTP-Referer": os.environ.get("AI_SITE_URL", "http://localhost:5000"),
-				"X-Title": os.environ.get("AI_APP_NAME", "Quiz Generator"),
-			}
-		client = OpenAI(api_key=api_key, base_url=base_url, default_headers=default_headers)
-		resp = client.chat.completions.create(
-			model=openai_model,
-			messages=[
-				{"role": "system", "content": "You produce strict JSON outputs."},
-				{"role": "user", "content": prompt},
-			],
-			temperature=0.5,
-			max_tokens=2000,
+		return {
+			"provider": "google",
+			"api_key": google_key,
+			"model": _model_for("google", model, "gemini-1.5-flash"),
+		}
+
+	if optional_module("openai") is None:
+		raise RuntimeError("OpenAI SDK not available. Install 'openai'.")
+	# Flexible OpenAI-compatible config
+	api_key = (
+		os.environ.get("AI_API_KEY")
+		or os.environ.get("OPENAI_API_KEY")
+		or ""
+	).strip()
+	if not api_key:
+		raise RuntimeError("AI_API_KEY/OPENAI_API_KEY is not set.")
+	base_url = os.environ.get("AI_BASE_URL", "").strip() or None
+	default_headers = None
+	if base_url and "openrouter.ai" in base_url:
+		default_headers = {
+			"HTTP-Referer": os.environ.get("AI_SITE_URL", "http://localhost:5000"),
+			"X-Title": os.environ.get("AI_APP_NAME", "Quiz Generator"),
+		}
+	return {
+		"provider": "openai",
+		"api_key": api_key,
+		"base_url": base_url,
+		"headers": default_headers,
+		"model": _model_for("openai", model, "gpt-4o-mini"),
+	}
+
+
+def _provider_chain(model: Optional[str] = None) -> List[Dict]:
+	"""Configs for every usable provider in AI_PROVIDER_CHAIN (or the detected provider).
+
+	Raises the first configuration error if no provider is usable.
+	"""
+	names: List[Optional[str]] = [None]
+	if AI_PROVIDER_CHAIN:
+		names = []
+		for name in AI_PROVIDER_CHAIN:
+			if name == "heuristic":
+				break
+			names.append(name)
+	configs: List[Dict] = []
+	errors: List[Exception] = []
+	for name in names:
+		try:
+			configs.append(_provider_config(model, name))
+		except RuntimeError as exc:
+			errors.append(exc)
+	if not configs:
+		raise errors[0] if errors else RuntimeError("No AI provider configured in AI_PROVIDER_CHAIN.")
+	return configs
+
+
+def _client_key(config: Dict) -> Tuple:
+	headers = tuple(sorted((config.get("headers") or {}).items()))
+	return (config["provider"], config["api_key"], config.get("base_url"), headers, config["model"])
+
+
+def _create_client(config: Dict):
+	if config["provider"] == "google":
+		genai = optional_module("google.generativeai")
+		genai.configure(api_key=config["api_key"])
+		return genai.GenerativeModel(config["model"])
+	# Retries are handled by utils.ai_policy, not the SDK
+	return optional_module("openai").OpenAI(
+		api_key=config["api_key"],
+		base_url=config["base_url"],
+		default_headers=config["headers"],
+		timeout=AI_TIMEOUT,
+		max_retries=0,
+	)
+
+
+def _get_client(config: Dict):
+	"""Process-wide client for this provider configuration, created on first use."""
+	key = _client_key(config)
+	client = _clients.get(key)
+	if client is None:
+		with _clients_lock:
+			client = _clients.get(key)
+			if client is None:
+				client = _clients[key] = _create_client(config)
+	return client
+
+
+def _create_async_client(config: Dict):
+	if config["provider"] == "google":
+		# GenerativeModel serves both generate_content and generate_content_async
+		return _create_client(config)
+	return optional_module("openai").AsyncOpenAI(
+		api_key=config["api_key"],
+		base_url=config["base_url"],
+		default_headers=config["headers"],
+		timeout=AI_TIMEOUT,
+		max_retries=0,
+	)
+
+
+def _get_async_client(config: Dict):
+	"""Client for this provider configuration on the running event loop, created on first use."""
+	# Only the loop's own thread touches its registry, so no lock is needed
+	clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+	key = _client_key(config)
+	client = clients.get(key)
+	if client is None:
+		client = clients[key] = _create_async_client(config)
+	return client
+
+
+def warm_up_clients() -> int:
+	"""Import the provider SDKs and create clients for every usable provider; returns how many."""
+	configs = _provider_chain()
+	for config in configs:
+		_get_client(config)
+	return len(configs)
+
+
+def reset_clients() -> None:
+	"""Drop all cached provider clients; also run in forked children so sockets are not shared."""
+	global _clients, _clients_lock, _async_clients
+	_clients = {}
+	_clients_lock = threading.Lock()
+	_async_clients = weakref.WeakKeyDictionary()
+
+
+if hasattr(os, "register_at_fork"):
+	os.register_at_fork(after_in_child=reset_clients)
+
+
+def _call_provider(prompt: str, config: Dict, policy: Optional[CallPolicy] = None) -> str:
+	"""Send the prompt to the configured provider and return the raw completion text.
+
+	Timeouts, retries with backoff and hedging follow ``policy`` (env defaults).
+	"""
+	policy = policy or CallPolicy()
+	start = time.perf_counter()
+	outcome = "error"
+	try:
+		text = call_with_policy(lambda: _request_completion(prompt, config, policy.timeout), policy)
+		outcome = "ok"
+		return text
+	finally:
+		AI_CALL_SECONDS.observe(time.perf_counter() - start, provider=config["provider"], outcome=outcome)
+
+
+def _request_completion(prompt: str, config: Dict, timeout: float = AI_TIMEOUT) -> str:
+	client = _get_client(config)
+	if config["provider"] == "google":
+		response = client.generate_content(prompt, request_options={"timeout": timeout})
+		return getattr(response, "text", "") or ""
+
+	resp = client.chat.completions.create(timeout=timeout, **_chat_request(prompt, config))
+	return resp.choices[0].message.content or ""
+
+
+def _no_hedge(policy: Optional[CallPolicy]) -> CallPolicy:
+	# A stream cannot be raced against a copy, so streams are only timed out and retried
+	policy = policy or CallPolicy()
+	return CallPolicy(policy.timeout, policy.max_retries, policy.backoff_base, policy.backoff_max, hedge_after=0)
+
+
+def _stream_provider(prompt: str, config: Dict, policy: Optional[CallPolicy] = None) -> Iterator[str]:
+	"""Like ``_call_provider`` but yields the completion text piece by piece as it streams in."""
+	client = _get_client(config)
+	# Only opening the stream is retried; a stream that fails part-way raises
+	no_hedge = _no_hedge(policy)
+	timeout = no_hedge.timeout
+	if config["provider"] == "google":
+		stream = call_with_policy(
+			lambda: client.generate_content(prompt, stream=True, request_options={"timeout": timeout}), no_hedge
+		)
+		for chunk in stream:
+			yield getattr(chunk, "text", "") or ""
+		return
+
+	stream = call_with_policy(
+		lambda: client.chat.completions.create(stream=True, timeout=timeout, **_chat_request(prompt, config)), no_hedge
+	)
+	for chunk in stream:
+		if chunk.choices:
+			yield chunk.choices[0].delta.content or ""
+
+
+async def _call_provider_async(prompt: str, config: Dict, policy: Optional[CallPolicy] = None) -> str:
+	"""``_call_provider`` on the event loop: waiting for the provider does not hold a thread."""
+	policy = policy or CallPolicy()
+	start = time.perf_counter()
+	outcome = "error"
+	try:
+		text = await call_with_policy_async(lambda: _request_completion_async(prompt, config, policy.timeout), policy)
+		outcome = "ok"
+		return text
+	finally:
+		AI_CALL_SECONDS.observe(time.perf_counter() - start, provider=config["provider"], outcome=outcome)
+
+
+async def _request_completion_async(prompt: str, config: Dict, timeout: float = AI_TIMEOUT) -> str:
+	client = _get_async_client(config)
+	if config["provider"] == "google":
+		response = await client.generate_content_async(prompt, request_options={"timeout": timeout})
+		return getattr(response, "text", "") or ""
+
+	resp = await client.chat.completions.create(timeout=timeout, **_chat_request(prompt, config))
+	return resp.choices[0].message.content or ""
+
+
+async def _stream_provider_async(
+	prompt: str, config: Dict, policy: Optional[CallPolicy] = None
+) -> AsyncIterator[str]:
+	"""Async ``_stream_provider``."""
+	client = _get_async_client(config)
+	no_hedge = _no_hedge(policy)
+	timeout = no_hedge.timeout
+	if config["provider"] == "google":
+		stream = await call_with_policy_async(
+			lambda: client.generate_content_async(prompt, stream=True, request_options={"timeout": timeout}), no_hedge
 		)
-		content = resp.choices[0].message.content or ""
-		items = _coerce_questions(content)
+		async for chunk in stream:
+			yield getattr(chunk, "text", "") or ""
+		return
 
+	stream = await call_with_policy_async(
+		lambda: client.chat.completions.create(stream=True, timeout=timeout, **_chat_request(prompt, config)), no_hedge
+	)
+	async for chunk in stream:
+		if chunk.choices:
+			yield chunk.choices[0].delta.content or ""
+
+
+def _chat_request(prompt: str, config: Dict) -> Dict:
 	# Use Chat Completions for broad compatibility
-	resp = client.chat.completions.create(
-		model=model,
-		messages=[
+	return {
+		"model": config["model"],
+		"messages": [
 			{"role": "system", "content": "You produce strict JSON outputs."},
 			{"role": "user", "content": prompt},
 		],
-		temperature=0.5,
-		max_tokens=2000,
+		"temperature": 0.5,
+		"max_tokens": 2000,
+	}
+
+
+def _normalize_question(q: Dict) -> Optional[Dict]:
+	"""Check one question object against the prompt's schema; ``None`` if it is unusable."""
+	question = q.get("question")
+	options = q.get("options")
+	answer_index = q.get("answer_index")
+	if not isinstance(question, str) or not question.strip():
+		return None
+	if not isinstance(options, list) or not all(isinstance(o, (str, int, float)) for o in options):
+		return None
+	if isinstance(answer_index, str) and answer_index.strip().isdigit():
+		answer_index = int(answer_index)
+	if isinstance(answer_index, bool) or not isinstance(answer_index, int):
+		return None
+	options = [str(o).strip() for o in options]
+	if answer_index < 0 or answer_index >= len(options):
+		return None
+	qtype = str(q.get("type") or "mcq").strip().lower()
+	if qtype in ("tf", "truefalse", "true/false", "boolean"):
+		qtype = "true_false"
+	# Enforce shapes
+	if qtype == "true_false":
+		correct = options[answer_index].lower()
+		answer_index = 0 if correct == "true" or (correct != "false" and answer_index == 0) else 1
+		options = ["True", "False"]
+	else:
+		if len(options) < 2:
+			return None
+		if len(options) > 4:
+			# Keep the correct option when trimming to 4
+			if answer_index >= 4:
+				options = options[:3] + [options[answer_index]]
+				answer_index = 3
+			else:
+				options = options[:4]
+		qtype = "mcq"
+	return {
+		"question": question.strip(),
+		"options": options,
+		"answer_index": answer_index,
+		"type": qtype,
+	}
+
+
+def _get_ai_cache() -> Optional[SQLiteCache]:
+	global _ai_cache
+	if _ai_cache is None and AI_CACHE_MAX_ENTRIES > 0:
+		with _ai_cache_lock:
+			if _ai_cache is None:
+				_ai_cache = SQLiteCache(AI_CACHE_PATH, ttl=AI_CACHE_TTL, max_entries=AI_CACHE_MAX_ENTRIES)
+	return _ai_cache
+
+
+def _cache_key(prompt: str, config: Dict) -> str:
+	return sha256_hex(prompt, config["provider"], config["model"])
+
+
+def _complete_questions(prompt: str, config: Dict, use_cache: bool = True) -> List[Dict]:
+	"""Normalized questions for ``prompt``, served from the response cache when possible."""
+	cache = _get_ai_cache() if use_cache else None
+	key = _cache_key(prompt, config)
+	if cache is not None:
+		cached = cache.get(key)
+		if cached is not None:
+			return json.loads(cached)
+
+	questions = _parse_questions(_call_provider(prompt, config))
+	if cache is not None and questions:
+		cache.set(key, json.dumps(questions))
+	return questions
+
+
+async def _complete_questions_async(prompt: str, config: Dict, use_cache: bool = True) -> List[Dict]:
+	"""Async ``_complete_questions``; the SQLite cache is read and written on a worker thread."""
+	cache = _get_ai_cache() if use_cache else None
+	key = _cache_key(prompt, config)
+	if cache is not None:
+		cached = await asyncio.to_thread(cache.get, key)
+		if cached is not None:
+			return json.loads(cached)
+
+	questions = _parse_questions(await _call_provider_async(prompt, config))
+	if cache is not None and questions:
+		await asyncio.to_thread(cache.set, key, json.dumps(questions))
+	return questions
+
+
+def ai_cache_stats() -> Dict[str, int]:
+	"""Hit/miss counters of the AI response cache in this process."""
+	cache = _ai_cache
+	return cache.stats() if cache is not None else {"hits": 0, "misses": 0}
+
+
+def _cache_metrics() -> List[str]:
+	stats = ai_cache_stats()
+	return stats_lines(
+		"quiz_ai_cache_requests_total", "AI response cache lookups in this process.", "counter", "result",
+		{"hit": stats["hits"], "miss": stats["misses"]},
 	)
-	content = resp.choices[0].message.content or ""
-	items = _coerce_questions(content)
-
-	# Normalize and validate
-	normalized: List[Dict] = []
-	for q in items:
-		question = str(q.get("question", "")).strip()
-		options = list(map(str, q.get("options", [])))
-		answer_index = int(q.get("answer_index", -1))
-		qtype = str(q.get("type", "mcq")).strip().lower() or "mcq"
-		if not question or not options or answer_index < 0 or answer_index >= len(options):
-			continue
-		# Enforce shapes
-		if qtype == "true_false":
-			options = ["True", "False"]
-			answer_index = 0 if answer_index == 0 else 1
-		elif qtype == "mcq":
-			# Trim/pad to 4 options if possible
-			options = options[:4] if len(options) >= 4 else options
-		if not options:
-			continue
-		normalized.append({
-			"question": question,
-			"options": options,
-			"answer_index": answer_index,
-			"type": qtype,
-		})
-
-	return normalized[:num_questions]
 
 
+register_collector(_cache_metrics)
+
+
+def _split_chunks(text: str, max_tokens: int) -> List[str]:
+	"""Pack whole sentences into chunks of at most ``max_tokens`` estimated tokens."""
+	max_chars = max(1, max_tokens * _CHARS_PER_TOKEN)
+	chunks: List[str] = []
+	current: List[str] = []
+	size = 0
+	for sentence in _sentence_split.split(text.strip()):
+		# A single oversized sentence is hard-split
+		pieces = [sentence[i:i + max_chars] for i in range(0, len(sentence), max_chars)] or [""]
+		for piece in pieces:
+			if current and size + len(piece) + 1 > max_chars:
+				chunks.append(" ".join(current))
+				current, size = [], 0
+			current.append(piece)
+			size += len(piece) + 1
+	if current:
+		chunks.append(" ".join(current))
+	return [c for c in chunks if c.strip()]
+
+
+def _allocate_questions(chunks: List[str], num_questions: int) -> List[int]:
+	"""Split ``num_questions`` across chunks in proportion to their length (largest remainder)."""
+	total = sum(len(c) for c in chunks) or 1
+	exact = [num_questions * len(c) / total for c in chunks]
+	shares = [int(x) for x in exact]
+	by_remainder = sorted(range(len(chunks)), key=lambda i: exact[i] - shares[i], reverse=True)
+	for i in by_remainder[:num_questions - sum(shares)]:
+		shares[i] += 1
+	return shares
+
+
+def _question_key(question: Dict) -> str:
+	return _question_key_pattern.sub(" ", question["question"].lower()).strip()
+
+
+def _merge_questions(batches: List[List[Dict]], num_questions: int) -> List[Dict]:
+	merged: List[Dict] = []
+	seen = set()
+	for batch in batches:
+		for q in batch:
+			key = _question_key(q)
+			if key in seen:
+				continue
+			seen.add(key)
+			merged.append(q)
+	# Neighbouring chunks often yield rewordings of the same fact
+	return dedupe_questions(merged)[:num_questions]
+
+
+def _generate_chunked(
+	chunks: List[str], num_questions: int, mode: str, config: Dict, use_cache: bool
+) -> List[Dict]:
+	"""Map each chunk to its share of questions concurrently, then merge in document order."""
+	jobs = [(chunk, share) for chunk, share in zip(chunks, _allocate_questions(chunks, num_questions)) if share > 0]
+
+	def run(job):
+		chunk, share = job
+		try:
+			return _complete_questions(_build_prompt(chunk, share, mode), config, use_cache), None
+		except Exception as exc:
+			return [], exc
+
+	with ThreadPoolExecutor(max_workers=max(1, min(AI_MAX_CONCURRENCY, len(jobs)))) as pool:
+		results = list(pool.map(run, jobs))
+
+	batches = [questions for questions, _ in results]
+	errors = [exc for _, exc in results if exc is not None]
+	if errors and not any(batches):
+		raise errors[0]
+	return _merge_questions(batches, num_questions)
+
+
+async def _generate_chunked_async(
+	chunks: List[str], num_questions: int, mode: str, config: Dict, use_cache: bool
+) -> List[Dict]:
+	"""Async ``_generate_chunked``: at most AI_MAX_CONCURRENCY chunk requests in flight per quiz."""
+	jobs = [(chunk, share) for chunk, share in zip(chunks, _allocate_questions(chunks, num_questions)) if share > 0]
+	limit = asyncio.Semaphore(max(1, AI_MAX_CONCURRENCY))
+
+	async def run(job):
+		chunk, share = job
+		async with limit:
+			try:
+				return await _complete_questions_async(_build_prompt(chunk, share, mode), config, use_cache), None
+			except Exception as exc:
+				return [], exc
+
+	results = await asyncio.gather(*(run(job) for job in jobs))
+	batches = [questions for questions, _ in results]
+	errors = [exc for _, exc in results if exc is not None]
+	if errors and not any(batches):
+		raise errors[0]
+	return _merge_questions(batches, num_questions)
+
+
+def generate_quiz_ai(
+	text: str,
+	num_questions: int,
+	mode: str = "mcq",
+	model: Optional[str] = None,
+	use_cache: bool = True,
+	chunked: Optional[bool] = None,
+) -> List[Dict]:
+	"""Generate quiz questions with the configured AI provider.
+
+	Identical (prompt, provider, model) requests are answered from a persistent
+	response cache unless ``use_cache`` is False. Texts longer than
+	``AI_CHUNK_TOKENS`` (or any text when ``chunked`` is True) are split along
+	sentence boundaries and the chunks are sent concurrently, at most
+	``AI_MAX_CONCURRENCY`` at a time; ``chunked=False`` forces a single prompt.
+	Providers in AI_PROVIDER_CHAIN are tried in turn until one succeeds.
+	"""
+	chunks = _split_chunks(text, AI_CHUNK_TOKENS) if chunked is not False else []
+	error: Optional[Exception] = None
+	for config in _provider_chain(model):
+		try:
+			if len(chunks) > 1 or (chunked and chunks):
+				return _generate_chunked(chunks, num_questions, mode, config, use_cache)
+			prompt = _build_prompt(text, num_questions, mode)
+			return dedupe_questions(_complete_questions(prompt, config, use_cache))[:num_questions]
+		except Exception as exc:
+			error = exc
+	raise error
+
+
+def iter_quiz_ai(
+	text: str,
+	num_questions: int,
+	mode: str = "mcq",
+	model: Optional[str] = None,
+	use_cache: bool = True,
+) -> Iterator[Dict]:
+	"""Yield AI questions one by one as they are parsed from the provider's streamed completion.
+
+	Cached responses are replayed; long texts use the concurrent chunked path
+	of ``generate_quiz_ai`` and yield its merged result. The next provider in
+	AI_PROVIDER_CHAIN is tried only if the previous one failed before yielding.
+	"""
+	chunks = _split_chunks(text, AI_CHUNK_TOKENS)
+	if len(chunks) > 1:
+		yield from generate_quiz_ai(text, num_questions, mode, model, use_cache)
+		return
+
+	error: Optional[Exception] = None
+	for config in _provider_chain(model):
+		sent = 0
+		try:
+			for question in _stream_questions(text, num_questions, mode, config, use_cache):
+				sent += 1
+				yield question
+			return
+		except Exception as exc:
+			if sent:
+				raise
+			error = exc
+	raise error
+
+
+def _stream_questions(text: str, num_questions: int, mode: str, config: Dict, use_cache: bool) -> Iterator[Dict]:
+	prompt = _build_prompt(text, num_questions, mode)
+	cache = _get_ai_cache() if use_cache else None
+	key = _cache_key(prompt, config)
+	seen = NearDuplicateFilter()
+	if cache is not None:
+		cached = cache.get(key)
+		if cached is not None:
+			yield from islice(seen.filter(json.loads(cached)), num_questions)
+			return
+
+	# Keep reading past num_questions so the full response is cached
+	questions: List[Dict] = []
+	sent = 0
+	parser = _JSONObjectStream(_normalize_question)
+	for piece in _stream_provider(prompt, config):
+		for question in parser.feed(piece):
+			questions.append(question)
+			if sent < num_questions and seen.add(question):
+				sent += 1
+				yield question
+	if cache is not None and questions:
+		cache.set(key, json.dumps(questions))
+
+
+async def generate_quiz_ai_async(
+	text: str,
+	num_questions: int,
+	mode: str = "mcq",
+	model: Optional[str] = None,
+	use_cache: bool = True,
+	chunked: Optional[bool] = None,
+) -> List[Dict]:
+	"""``generate_quiz_ai`` with AsyncOpenAI / ``generate_content_async``, for the ASGI app.
+
+	Same chunking, caching, provider chain and result; a request waiting on the
+	provider costs a coroutine rather than a worker thread.
+	"""
+	chunks = _split_chunks(text, AI_CHUNK_TOKENS) if chunked is not False else []
+	error: Optional[Exception] = None
+	for config in _provider_chain(model):
+		try:
+			if len(chunks) > 1 or (chunked and chunks):
+				return await _generate_chunked_async(chunks, num_questions, mode, config, use_cache)
+			prompt = _build_prompt(text, num_questions, mode)
+			return dedupe_questions(await _complete_questions_async(prompt, config, use_cache))[:num_questions]
+		except Exception as exc:
+			error = exc
+	raise error
+
+
+async def iter_quiz_ai_async(
+	text: str,
+	num_questions: int,
+	mode: str = "mcq",
+	model: Optional[str] = None,
+	use_cache: bool = True,
+) -> AsyncIterator[Dict]:
+	"""Async ``iter_quiz_ai``: yields questions as they are parsed from the streamed completion."""
+	chunks = _split_chunks(text, AI_CHUNK_TOKENS)
+	if len(chunks) > 1:
+		for question in await generate_quiz_ai_async(text, num_questions, mode, model, use_cache):
+			yield question
+		return
+
+	error: Optional[Exception] = None
+	for config in _provider_chain(model):
+		sent = 0
+		try:
+			async for question in _stream_questions_async(text, num_questions, mode, config, use_cache):
+				sent += 1
+				yield question
+			return
+		except Exception as exc:
+			if sent:
+				raise
+			error = exc
+	raise error
+
+
+async def _stream_questions_async(
+	text: str, num_questions: int, mode: str, config: Dict, use_cache: bool
+) -> AsyncIterator[Dict]:
+	prompt = _build_prompt(text, num_questions, mode)
+	cache = _get_ai_cache() if use_cache else None
+	key = _cache_key(prompt, config)
+	seen = NearDuplicateFilter()
+	if cache is not None:
+		cached = await asyncio.to_thread(cache.get, key)
+		if cached is not None:
+			for question in islice(seen.filter(json.loads(cached)), num_questions):
+				yield question
+			return
+
+	questions: List[Dict] = []
+	sent = 0
+	parser = _JSONObjectStream(_normalize_question)
+	async for piece in _stream_provider_async(prompt, config):
+		for question in parser.feed(piece):
+			questions.append(question)
+			if sent < num_questions and seen.add(question):
+				sent += 1
+				yield question
+	if cache is not None and questions:
+		await asyncio.to_thread(cache.set, key, json.dumps(questions))
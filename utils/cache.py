@@ -0,0 +1,251 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+
+def sha256_hex(*parts) -> str:
+	"""Hex SHA-256 over the given str/bytes parts (str parts are UTF-8 encoded)."""
+	h = hashlib.sha256()
+	for part in parts:
+		if isinstance(part, str):
+			part = part.encode("utf-8")
+		h.update(part)
+		h.update(b"\0")
+	return h.hexdigest()
+
+
+class LRUCache:
+	"""Thread-safe in-memory LRU bounded by entry count and, optionally, total size."""
+
+	def __init__(self, max_entries: int = 128, max_size: Optional[int] = None, sizeof: Callable = len):
+		self.max_entries = max_entries
+		self.max_size = max_size
+		self.sizeof = sizeof
+		self.size = 0
+		self.hits = 0
+		self.misses = 0
+		self._data: "OrderedDict[Hashable, object]" = OrderedDict()
+		self._lock = threading.Lock()
+
+	def get(self, key: Hashable, default=None):
+		with self._lock:
+			if key in self._data:
+				self._data.move_to_end(key)
+				self.hits += 1
+				return self._data[key]
+			self.misses += 1
+			return default
+
+	def set(self, key: Hashable, value) -> None:
+		if self.max_entries <= 0:
+			return
+		size = self.sizeof(value) if self.max_size is not None else 0
+		if self.max_size is not None and size > self.max_size:
+			return
+		with self._lock:
+			if key in self._data:
+				self.size -= self._entry_size(self._data.pop(key))
+			self._data[key] = value
+			self.size += size
+			while len(self._data) > self.max_entries or (self.max_size is not None and self.size > self.max_size):
+				_, evicted = self._data.popitem(last=False)
+				self.size -= self._entry_size(evicted)
+
+	def _entry_size(self, value) -> int:
+		return self.sizeof(value) if self.max_size is not None else 0
+
+	def clear(self) -> None:
+		with self._lock:
+			self._data.clear()
+			self.size = 0
+
+	def __len__(self) -> int:
+		return len(self._data)
+
+	def stats(self) -> Dict[str, int]:
+		return {"entries": len(self._data), "size": self.size, "hits": self.hits, "misses": self.misses}
+
+
+class DiskCache:
+	"""Text files named by key under ``directory``, evicting least-recently-used files above ``max_bytes``.
+
+	Safe to share between processes: writes go through a temp file and ``os.replace``.
+	"""
+
+	def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024, suffix: str = ".txt"):
+		self.directory = directory
+		self.max_bytes = max_bytes
+		self.suffix = suffix
+		self.hits = 0
+		self.misses = 0
+		os.makedirs(directory, exist_ok=True)
+
+	def _path(self, key: str) -> str:
+		return os.path.join(self.directory, key + self.suffix)
+
+	def get(self, key: str) -> Optional[str]:
+		path = self._path(key)
+		try:
+			with open(path, "r", encoding="utf-8") as fh:
+				value = fh.read()
+		except OSError:
+			self.misses += 1
+			return None
+		try:
+			os.utime(path)  # mark as recently used
+		except OSError:
+			pass
+		self.hits += 1
+		return value
+
+	def set(self, key: str, value: str) -> None:
+		fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+		try:
+			with os.fdopen(fd, "w", encoding="utf-8") as fh:
+				fh.write(value)
+			os.replace(tmp_path, self._path(key))
+		except OSError:
+			try:
+				os.unlink(tmp_path)
+			except OSError:
+				pass
+			return
+		self._evict()
+
+	def _evict(self) -> None:
+		entries = []
+		total = 0
+		with os.scandir(self.directory) as it:
+			for entry in it:
+				if not entry.name.endswith(self.suffix):
+					continue
+				try:
+					st = entry.stat()
+				except OSError:
+					continue
+				entries.append((st.st_mtime, st.st_size, entry.path))
+				total += st.st_size
+		if total <= self.max_bytes:
+			return
+		entries.sort()
+		for _, size, path in entries:
+			try:
+				os.unlink(path)
+			except OSError:
+				continue
+			total -= size
+			if total <= self.max_bytes:
+				break
+
+	def stats(self) -> Dict[str, int]:
+		return {"hits": self.hits, "misses": self.misses}
+
+
+class TieredCache:
+	"""In-memory LRU in front of an optional shared disk tier."""
+
+	def __init__(self, memory: LRUCache, disk: Optional[DiskCache] = None):
+		self.memory = memory
+		self.disk = disk
+
+	def get(self, key: str) -> Optional[str]:
+		value = self.memory.get(key)
+		if value is None and self.disk is not None:
+			value = self.disk.get(key)
+			if value is not None:
+				self.memory.set(key, value)
+		return value
+
+	def set(self, key: str, value: str) -> None:
+		self.memory.set(key, value)
+		if self.disk is not None:
+			self.disk.set(key, value)
+
+	def stats(self) -> Dict[str, int]:
+		disk = self.disk.stats() if self.disk is not None else {"hits": 0, "misses": 0}
+		memory = self.memory.stats()
+		return {
+			"hits": memory["hits"] + disk["hits"],
+			"misses": disk["misses"] if self.disk is not None else memory["misses"],
+			"memory_hits": memory["hits"],
+			"disk_hits": disk["hits"],
+			"memory_entries": memory["entries"],
+		}
+
+
+def thread_local_connection(local: threading.local, path: str) -> sqlite3.Connection:
+	"""The calling thread's WAL-mode connection to ``path``, cached on ``local``.
+
+	One connection per thread and per process: connections must not cross a fork.
+	"""
+	conn = getattr(local, "conn", None)
+	if conn is None or local.pid != os.getpid():
+		conn = sqlite3.connect(path, timeout=5.0)
+		conn.execute("PRAGMA journal_mode=WAL")
+		local.conn = conn
+		local.pid = os.getpid()
+	return conn
+
+
+class SQLiteCache:
+	"""Key/value text cache in a SQLite file shared by all worker processes.
+
+	Entries expire after ``ttl`` seconds (``None`` keeps them forever); once the
+	table holds more than ``max_entries`` rows the least recently used are dropped.
+	"""
+
+	def __init__(self, path: str, ttl: Optional[float] = None, max_entries: int = 1000):
+		self.path = path
+		self.ttl = ttl
+		self.max_entries = max_entries
+		self.hits = 0
+		self.misses = 0
+		self._local = threading.local()
+		with self._connect() as conn:
+			conn.execute(
+				"CREATE TABLE IF NOT EXISTS cache ("
+				"key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, used REAL NOT NULL)"
+			)
+			conn.execute("CREATE INDEX IF NOT EXISTS cache_used ON cache (used)")
+
+	def _connect(self) -> sqlite3.Connection:
+		return thread_local_connection(self._local, self.path)
+
+	def get(self, key: str) -> Optional[str]:
+		now = time.time()
+		conn = self._connect()
+		with conn:
+			row = conn.execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+			if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+				conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+				row = None
+			if row is None:
+				self.misses += 1
+				return None
+			conn.execute("UPDATE cache SET used = ? WHERE key = ?", (now, key))
+		self.hits += 1
+		return row[0]
+
+	def set(self, key: str, value: str) -> None:
+		now = time.time()
+		conn = self._connect()
+		with conn:
+			conn.execute(
+				"INSERT OR REPLACE INTO cache (key, value, created, used) VALUES (?, ?, ?, ?)",
+				(key, value, now, now),
+			)
+			if self.ttl is not None:
+				conn.execute("DELETE FROM cache WHERE created < ?", (now - self.ttl,))
+			conn.execute(
+				"DELETE FROM cache WHERE key IN ("
+				"SELECT key FROM cache ORDER BY used DESC LIMIT -1 OFFSET ?)",
+				(self.max_entries,),
+			)
+
+	def stats(self) -> Dict[str, int]:
+		return {"hits": self.hits, "misses": self.misses}
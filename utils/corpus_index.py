@@ -0,0 +1,181 @@
+import math
+import mmap
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from utils.lazy import optional_module
+
+try:
+	import fcntl
+except ImportError:  # Windows: a single worker process is assumed
+	fcntl = None
+
+# Document frequencies of every uploaded document's terms, shared by all workers on this host
+CORPUS_INDEX_DIR = os.environ.get("CORPUS_INDEX_DIR", "").strip() or os.path.join(tempfile.gettempdir(), "quiz_corpus_index")
+# New terms are ignored once the vocabulary reaches this size (0 disables the index)
+CORPUS_INDEX_MAX_TERMS = int(os.environ.get("CORPUS_INDEX_MAX_TERMS", "500000") or 0)
+
+_DF_ITEM = 4  # bytes per document frequency (uint32)
+
+
+class CorpusIndex:
+	"""Document frequencies for the terms of every indexed document, kept on disk.
+
+	``vocab.txt`` holds one term per line (line number = term id), ``df.u32``
+	the uint32 document frequency of each term id (memory-mapped, so counts
+	written by other processes are visible without reloading), and
+	``docs.txt`` the digest of each indexed document so re-uploads are counted
+	once. Updates append under an exclusive file lock; readers pick up new
+	lines incrementally.
+	"""
+
+	def __init__(self, directory: str = CORPUS_INDEX_DIR, max_terms: int = CORPUS_INDEX_MAX_TERMS):
+		os.makedirs(directory, exist_ok=True)
+		self.max_terms = max_terms
+		self._vocab_path = os.path.join(directory, "vocab.txt")
+		self._docs_path = os.path.join(directory, "docs.txt")
+		self._df_path = os.path.join(directory, "df.u32")
+		self._lock_path = os.path.join(directory, "lock")
+		for path in (self._vocab_path, self._docs_path, self._df_path):
+			open(path, "ab").close()
+		self._lock = threading.Lock()
+		self._terms: Dict[str, int] = {}
+		self._docs: set = set()
+		self._vocab_offset = 0
+		self._docs_offset = 0
+		self._df_map: Optional[mmap.mmap] = None
+		self._df = None  # numpy uint32 array or memoryview over the mapping
+		with self._lock:
+			self._refresh()
+
+	@contextmanager
+	def _file_lock(self):
+		with open(self._lock_path, "ab") as fh:
+			if fcntl is not None:
+				fcntl.flock(fh, fcntl.LOCK_EX)
+			try:
+				yield
+			finally:
+				if fcntl is not None:
+					fcntl.flock(fh, fcntl.LOCK_UN)
+
+	@staticmethod
+	def _read_lines(path: str, offset: int):
+		"""Complete lines appended to ``path`` since byte ``offset``, and the new offset."""
+		if os.path.getsize(path) <= offset:
+			return [], offset
+		with open(path, "rb") as fh:
+			fh.seek(offset)
+			data = fh.read()
+		# A writer may be mid-line; leave the partial tail for the next refresh
+		end = data.rfind(b"\n") + 1
+		return data[:end].decode("utf-8").splitlines(), offset + end
+
+	def _refresh(self) -> None:
+		terms, self._vocab_offset = self._read_lines(self._vocab_path, self._vocab_offset)
+		for term in terms:
+			self._terms.setdefault(term, len(self._terms))
+		docs, self._docs_offset = self._read_lines(self._docs_path, self._docs_offset)
+		self._docs.update(docs)
+		size = os.path.getsize(self._df_path)
+		if size and (self._df_map is None or len(self._df_map) != size):
+			with open(self._df_path, "r+b") as fh:
+				self._df_map = mmap.mmap(fh.fileno(), size)
+			# Views keep the old mapping alive until they are dropped; it is never closed explicitly.
+			# Without numpy, document frequencies are read one term at a time.
+			np = optional_module("numpy")
+			self._df = np.frombuffer(self._df_map, dtype=np.uint32) if np is not None else memoryview(self._df_map).cast("I")
+
+	@property
+	def num_docs(self) -> int:
+		return len(self._docs)
+
+	def add_document(self, terms: Iterable[str], digest: str) -> bool:
+		"""Count each distinct term of one document; False if ``digest`` was already indexed."""
+		with self._lock, self._file_lock():
+			self._refresh()
+			if digest in self._docs:
+				return False
+			terms = set(terms)
+			room = max(0, self.max_terms - len(self._terms))
+			new = [t for t in terms if t not in self._terms][:room]
+			if new:
+				# Grow the counts before publishing the terms, so every visible id has a slot
+				with open(self._df_path, "ab") as fh:
+					fh.write(bytes(_DF_ITEM * len(new)))
+				with open(self._vocab_path, "a", encoding="utf-8") as fh:
+					fh.write("".join(t + "\n" for t in new))
+				self._refresh()
+			ids = [self._terms[t] for t in terms if t in self._terms]
+			if ids:
+				if isinstance(self._df, memoryview):
+					df = self._df
+					for idx in ids:
+						df[idx] += 1
+				else:
+					self._df[ids] += 1
+				self._df_map.flush()
+			with open(self._docs_path, "a", encoding="utf-8") as fh:
+				fh.write(digest + "\n")
+			self._refresh()
+			return True
+
+	def idf(self, words: Sequence[str]) -> List[float]:
+		"""Smoothed inverse document frequency of each word: ln((N + 1) / (df + 1)) + 1."""
+		with self._lock:
+			self._refresh()
+			terms, df, n = self._terms, self._df, self.num_docs
+			limit = len(df) if df is not None else 0
+			ids = [terms.get(w, -1) for w in words]
+			np = optional_module("numpy")
+			if np is not None:
+				ids = np.array(ids, dtype=np.int64)
+				counts = np.zeros(len(ids), dtype=np.float64)
+				known = (ids >= 0) & (ids < limit)
+				if limit:
+					counts[known] = df[ids[known]]
+				return (np.log((n + 1) / (counts + 1)) + 1).tolist()
+			return [
+				math.log((n + 1) / ((df[i] if 0 <= i < limit else 0) + 1)) + 1
+				for i in ids
+			]
+
+
+_index: Optional[CorpusIndex] = None
+_index_lock = threading.Lock()
+_index_pid: Optional[int] = None
+_indexer: Optional[ThreadPoolExecutor] = None
+
+
+def get_corpus_index() -> Optional[CorpusIndex]:
+	"""Process-wide index at CORPUS_INDEX_DIR, or None when disabled or unavailable."""
+	global _index, _index_pid, _indexer
+	if CORPUS_INDEX_MAX_TERMS <= 0:
+		return None
+	# Mappings and the indexing thread do not survive a fork, so each worker opens its own
+	if _index_pid != os.getpid():
+		with _index_lock:
+			if _index_pid != os.getpid():
+				try:
+					_index = CorpusIndex()
+				except OSError:
+					_index = None
+				_indexer = None
+				_index_pid = os.getpid()
+	return _index
+
+
+def index_document_async(terms: Iterable[str], digest: str) -> None:
+	"""Add a document to the index on a background thread, off the request path."""
+	global _indexer
+	index = get_corpus_index()
+	if index is None:
+		return
+	with _index_lock:
+		if _indexer is None:
+			_indexer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="corpus-index")
+	_indexer.submit(index.add_document, terms, digest)
@@ -0,0 +1,148 @@
+"""Near-duplicate filtering for generated questions.
+
+Each question is reduced to a MinHash signature over hashed word n-grams of
+its statement (MCQ blanks are filled with the correct answer, so a blanked
+sentence and a true/false rewrite of it compare as the same idea). Signatures
+agree in roughly the Jaccard-similarity fraction of positions, so comparing
+them is a vectorized equality check instead of pairwise set work.
+"""
+import os
+import random
+import re
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from utils.lazy import optional_module
+
+# Questions whose estimated similarity to an earlier one is at least this are dropped (0 disables)
+DEDUP_THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", "0.6") or 0)
+DEDUP_NUM_HASHES = int(os.environ.get("DEDUP_NUM_HASHES", "64") or 64)
+DEDUP_NGRAM = 2
+
+_PRIME = (1 << 31) - 1
+_BLANK = "_____"
+_token_pattern = re.compile(r"[a-z0-9]+")
+# Rows of the similarity matrix computed per step, to bound the (rows, n, hashes) temporary
+_BLOCK_ROWS = 64
+
+_rng = random.Random(0x5EED)
+_hash_params = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(DEDUP_NUM_HASHES)]
+_hash_a = _hash_b = None
+
+
+def _numpy():
+	"""numpy (imported on first use), or None to take the pure-Python path, which gives the same results."""
+	global _hash_a, _hash_b
+	np = optional_module("numpy")
+	if np is not None and _hash_a is None:
+		_hash_b = np.array([b for _, b in _hash_params], dtype=np.uint64)[:, None]
+		_hash_a = np.array([a for a, _ in _hash_params], dtype=np.uint64)[:, None]
+	return np
+
+
+def _statement(question: Dict) -> str:
+	text = str(question.get("question", ""))
+	options = question.get("options") or []
+	index = question.get("answer_index", -1)
+	if _BLANK in text and isinstance(index, int) and 0 <= index < len(options):
+		text = text.replace(_BLANK, str(options[index]), 1)
+	return text.lower()
+
+
+def _shingles(question: Dict) -> List[int]:
+	"""Hashed word n-grams of the question statement (unigrams for very short ones)."""
+	tokens = _token_pattern.findall(_statement(question))
+	n = DEDUP_NGRAM if len(tokens) >= DEDUP_NGRAM else 1
+	grams = {" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1)}
+	return [zlib.crc32(gram.encode("utf-8")) % _PRIME for gram in grams]
+
+
+def _signature(shingles: List[int]):
+	np = _numpy()
+	if np is not None:
+		x = np.array(shingles, dtype=np.uint64)
+		return ((_hash_a * x + _hash_b) % _PRIME).min(axis=1)
+	return [min((a * x + b) % _PRIME for x in shingles) for a, b in _hash_params]
+
+
+def _signatures(shingle_sets: List[List[int]]):
+	"""MinHash signatures for many questions as one (n, hashes) matrix, in a single pass."""
+	np = _numpy()
+	lengths = np.array([len(s) for s in shingle_sets], dtype=np.int64)
+	flat = np.fromiter((x for s in shingle_sets for x in s), dtype=np.uint64, count=int(lengths.sum()))
+	hashed = (_hash_a * flat + _hash_b) % _PRIME
+	offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+	return np.minimum.reduceat(hashed, offsets, axis=1).T
+
+
+def _similarity(a: List[int], b: List[int]) -> float:
+	return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def dedupe_questions(questions: List[Dict], threshold: Optional[float] = None) -> List[Dict]:
+	"""Drop questions too similar to an earlier one, keeping input order."""
+	threshold = DEDUP_THRESHOLD if threshold is None else threshold
+	if threshold <= 0 or len(questions) < 2:
+		return list(questions)
+	shingle_sets = [_shingles(q) for q in questions]
+	# Questions with no words are never treated as duplicates
+	candidates = [i for i, s in enumerate(shingle_sets) if s]
+	np = _numpy()
+	if np is None or len(candidates) < 2:
+		return NearDuplicateFilter(threshold).filter_list(questions)
+
+	sigs = _signatures([shingle_sets[i] for i in candidates])
+	n = len(candidates)
+	duplicate = np.zeros((n, n), dtype=bool)
+	for start in range(0, n, _BLOCK_ROWS):
+		block = sigs[start:start + _BLOCK_ROWS]
+		duplicate[start:start + len(block)] = (block[:, None, :] == sigs[None, :, :]).mean(axis=2) >= threshold
+	# Only earlier questions count; walk in order so a dropped question cannot knock out a later one
+	duplicate = np.tril(duplicate, k=-1)
+	kept = np.ones(n, dtype=bool)
+	for i in np.flatnonzero(duplicate.any(axis=1)):
+		kept[i] = not (duplicate[i] & kept).any()
+	dropped = {candidates[i] for i in np.flatnonzero(~kept)}
+	return [q for i, q in enumerate(questions) if i not in dropped]
+
+
+class NearDuplicateFilter:
+	"""Incremental form of ``dedupe_questions`` for question streams."""
+
+	def __init__(self, threshold: Optional[float] = None):
+		self.threshold = DEDUP_THRESHOLD if threshold is None else threshold
+		self._count = 0
+		np = self._np = _numpy()
+		self._sigs = np.empty((16, DEDUP_NUM_HASHES), dtype=np.uint64) if np is not None else []
+
+	def add(self, question: Dict) -> bool:
+		"""Record ``question`` and return True, or return False if it duplicates a kept one."""
+		if self.threshold <= 0:
+			return True
+		shingles = _shingles(question)
+		if not shingles:
+			return True
+		sig = _signature(shingles)
+		np = self._np
+		if np is not None:
+			kept = self._sigs[:self._count]
+			if self._count and (kept == sig).mean(axis=1).max() >= self.threshold:
+				return False
+			if self._count == len(self._sigs):
+				self._sigs = np.concatenate((self._sigs, np.empty_like(self._sigs)))
+			self._sigs[self._count] = sig
+		else:
+			if any(_similarity(sig, other) >= self.threshold for other in self._sigs):
+				return False
+			self._sigs.append(sig)
+		self._count += 1
+		return True
+
+	def filter(self, questions: Iterable[Dict]) -> Iterator[Dict]:
+		"""Lazily yield the questions that are not near-duplicates of earlier ones."""
+		for question in questions:
+			if self.add(question):
+				yield question
+
+	def filter_list(self, questions: Iterable[Dict]) -> List[Dict]:
+		return list(self.filter(questions))
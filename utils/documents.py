@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, Optional
+
+from utils.cache import sha256_hex, thread_local_connection
+
+# Extracted upload text, kept server-side so clients send a doc_id instead of the text
+DOC_DB_PATH = os.environ.get("DOC_DB_PATH", "").strip() or os.path.join(tempfile.gettempdir(), "quiz_documents.sqlite3")
+DOC_TTL = float(os.environ.get("DOC_TTL", "86400") or 86400)
+# Least recently used documents are dropped once the stored text exceeds this many characters
+DOC_STORE_MAX_CHARS = int(os.environ.get("DOC_STORE_MAX_CHARS", str(256 * 1024 * 1024)) or 0)
+DOC_PREVIEW_CHARS = int(os.environ.get("DOC_PREVIEW_CHARS", "2000") or 0)
+
+_DOC_ID_LENGTH = 32
+
+
+class DocumentNotFound(ValueError):
+	"""The requested doc_id was never stored, has expired or was evicted."""
+
+
+class SQLiteDocumentStore:
+	"""Document text in a SQLite file shared by all worker processes.
+
+	Ids are a prefix of the SHA-256 of the text, so re-uploading a document
+	returns the same id. Documents expire ``ttl`` seconds after their last use.
+	"""
+
+	def __init__(self, path: str = DOC_DB_PATH, ttl: float = DOC_TTL, max_chars: int = DOC_STORE_MAX_CHARS):
+		self.path = path
+		self.ttl = ttl
+		self.max_chars = max_chars
+		self._local = threading.local()
+		with self._connect() as conn:
+			conn.execute(
+				"CREATE TABLE IF NOT EXISTS documents ("
+				"id TEXT PRIMARY KEY, text TEXT NOT NULL, chars INTEGER NOT NULL, "
+				"created REAL NOT NULL, used REAL NOT NULL)"
+			)
+			conn.execute("CREATE INDEX IF NOT EXISTS documents_used ON documents (used)")
+
+	def _connect(self) -> sqlite3.Connection:
+		return thread_local_connection(self._local, self.path)
+
+	def put(self, text: str) -> str:
+		"""Store ``text`` and return its doc_id."""
+		doc_id = sha256_hex(text)[:_DOC_ID_LENGTH]
+		now = time.time()
+		with self._connect() as conn:
+			updated = conn.execute("UPDATE documents SET used = ? WHERE id = ?", (now, doc_id)).rowcount
+			if not updated:
+				conn.execute(
+					"INSERT INTO documents (id, text, chars, created, used) VALUES (?, ?, ?, ?, ?)",
+					(doc_id, text, len(text), now, now),
+				)
+			conn.execute("DELETE FROM documents WHERE used < ?", (now - self.ttl,))
+			if self.max_chars > 0:
+				# Keep the most recently used documents whose running total fits the limit
+				conn.execute(
+					"DELETE FROM documents WHERE id IN ("
+					"SELECT id FROM (SELECT id, SUM(chars) OVER (ORDER BY used DESC, id) AS total FROM documents) "
+					"WHERE total > ? AND id != ?)",
+					(self.max_chars, doc_id),
+				)
+		return doc_id
+
+	def get(self, doc_id: str) -> Optional[str]:
+		now = time.time()
+		with self._connect() as conn:
+			row = conn.execute(
+				"SELECT text FROM documents WHERE id = ? AND used >= ?", (doc_id, now - self.ttl)
+			).fetchone()
+			if row is None:
+				return None
+			conn.execute("UPDATE documents SET used = ? WHERE id = ?", (now, doc_id))
+		return row[0]
+
+
+def describe_document(doc_id: str, text: str) -> Dict:
+	"""The /upload response for a stored document: its id, size and the start of its text."""
+	preview = text[:DOC_PREVIEW_CHARS]
+	return {"doc_id": doc_id, "chars": len(text), "preview": preview, "truncated": len(preview) < len(text)}
+
+
+_store: Optional[SQLiteDocumentStore] = None
+_store_lock = threading.Lock()
+
+
+def get_document_store() -> SQLiteDocumentStore:
+	"""Process-wide document store at DOC_DB_PATH."""
+	global _store
+	if _store is None:
+		with _store_lock:
+			if _store is None:
+				_store = SQLiteDocumentStore()
+	return _store
+
+
+def load_document(doc_id: str) -> str:
+	"""Text stored under ``doc_id``; raises DocumentNotFound if it is unknown or expired."""
+	text = get_document_store().get(doc_id)
+	if text is None:
+		raise DocumentNotFound("Document not found or expired; upload the file again")
+	return text
@@ -1,47 +1,387 @@
+import hashlib
 import io
-from typing import Text
+import mmap
+import os
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Iterator, List, Optional, Sequence, Text, Tuple
+from xml.parsers import expat
 
-from PyPDF2 import PdfReader
-from docx import Document
+from utils.cache import DiskCache, LRUCache, TieredCache
+from utils.metrics import EXTRACT_SECONDS, register_collector, stats_lines
 
+# Worker processes for PDF extraction; 0 or 1 keeps extraction in-process
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", "0") or 0)
+# Below this page count the process pool costs more than it saves
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "16") or 16)
+# Pages handed to a worker per task
+PDF_PAGES_PER_TASK = 8
+
+# Upload limits: larger files are rejected, longer extracted text is cut off (0 = no limit)
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)) or 0)
+EXTRACT_MAX_CHARS = int(os.environ.get("EXTRACT_MAX_CHARS", str(10_000_000)) or 0)
+# Uploads that are not already on disk are spooled; only this much stays in memory
+UPLOAD_SPOOL_MEMORY_BYTES = 1024 * 1024
+_COPY_CHUNK_BYTES = 64 * 1024
+
+# Content-addressed cache of extracted text, keyed by SHA-256 of the upload bytes
+EXTRACT_CACHE_ENTRIES = int(os.environ.get("EXTRACT_CACHE_ENTRIES", "64") or 0)
+EXTRACT_CACHE_MAX_CHARS = int(os.environ.get("EXTRACT_CACHE_MAX_CHARS", str(64 * 1024 * 1024)) or 0)
+EXTRACT_CACHE_DIR = os.environ.get("EXTRACT_CACHE_DIR", "").strip() or None
+EXTRACT_CACHE_DIR_MAX_BYTES = int(os.environ.get("EXTRACT_CACHE_DIR_MAX_BYTES", str(512 * 1024 * 1024)) or 0)
+# Bumped when an extractor's output changes, so text cached from the old one is not served
+_CACHE_KEY_VERSIONS = {"docx": "2"}
+
+_extraction_cache = TieredCache(
+	LRUCache(EXTRACT_CACHE_ENTRIES, max_size=EXTRACT_CACHE_MAX_CHARS),
+	DiskCache(EXTRACT_CACHE_DIR, EXTRACT_CACHE_DIR_MAX_BYTES) if EXTRACT_CACHE_DIR else None,
+)
+
+_worker_reader = None
+
+
+class UploadTooLarge(ValueError):
+	pass
+
+
+class _MappedFile(io.RawIOBase):
+	"""Read-only, seekable file interface over an mmap (zipfile needs ``seekable``)."""
+
+	def __init__(self, mapped: mmap.mmap):
+		super().__init__()
+		self._mapped = mapped
+
+	def readable(self) -> bool:
+		return True
+
+	def seekable(self) -> bool:
+		return True
+
+	def readinto(self, buffer) -> int:
+		data = self._mapped.read(len(buffer))
+		buffer[:len(data)] = data
+		return len(data)
+
+	def read(self, size: int = -1) -> bytes:
+		return self._mapped.read(None if size is None or size < 0 else size)
+
+	def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+		self._mapped.seek(offset, whence)
+		return self._mapped.tell()
+
+	def tell(self) -> int:
+		return self._mapped.tell()
+
+	def close(self) -> None:
+		if not self.closed:
+			self._mapped.close()
+		super().close()
+
+
+def _pdf_worker_init(path: str) -> None:
+	global _worker_reader
+	from PyPDF2 import PdfReader
+
+	# Each worker maps the file itself, so the upload is never copied into worker memory
+	try:
+		with open(path, "rb") as fh:
+			mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+	except OSError:
+		# The parent stopped reading and removed its temporary copy before this worker started
+		_worker_reader = None
+		return
+	_worker_reader = PdfReader(_MappedFile(mapped))
+
+
+def _pdf_worker_pages(page_numbers: Sequence[int]) -> List[Text]:
+	return [_worker_reader.pages[i].extract_text() or "" for i in page_numbers]
+
+
+def _named_file(file_like: BinaryIO) -> Tuple[str, bool]:
+	"""A path holding the bytes of ``file_like``, and whether it is a temporary copy to delete.
+
+	Spooled and in-memory uploads have no path, so they are copied to a
+	temporary file in chunks.
+	"""
+	name = getattr(file_like, "name", None)
+	if isinstance(name, str) and os.path.isfile(name):
+		return name, False
+	file_like.seek(0)
+	with tempfile.NamedTemporaryFile(prefix="quiz-pdf-", suffix=".pdf", delete=False) as fh:
+		shutil.copyfileobj(file_like, fh, _COPY_CHUNK_BYTES)
+	return fh.name, True
+
+
+def iter_pdf_pages(file_like: BinaryIO, workers: Optional[int] = None) -> Iterator[Text]:
+	"""Yield the text of each PDF page, in page order, as soon as it is extracted.
+
+	With ``workers`` > 1 (default ``PDF_WORKERS``) pages are extracted on a
+	process pool; results are still yielded strictly in page order.
+	"""
+	workers = PDF_WORKERS if workers is None else workers
+	# Parsers are imported on first use so cold starts that never see a PDF/DOCX skip them
+	from PyPDF2 import PdfReader
 
-def _extract_pdf(file_like: io.BytesIO) -> Text:
 	reader = PdfReader(file_like)
-	pages_text = []
-	for page in reader.pages:
-		page_text = page.extract_text() or ""
-		pages_text.append(page_text)
-	return "\n".join(pages_text).strip()
+	num_pages = len(reader.pages)
+	if workers <= 1 or num_pages < PDF_PARALLEL_MIN_PAGES:
+		for page in reader.pages:
+			yield page.extract_text() or ""
+		return
+
+	# Workers get a path and map the file, so memory does not grow with the number of workers
+	path, temporary = _named_file(file_like)
+	tasks = [range(i, min(i + PDF_PAGES_PER_TASK, num_pages)) for i in range(0, num_pages, PDF_PAGES_PER_TASK)]
+	pool = ProcessPoolExecutor(max_workers=workers, initializer=_pdf_worker_init, initargs=(path,))
+	try:
+		# map() returns results in submission order, so page order is deterministic
+		for texts in pool.map(_pdf_worker_pages, tasks):
+			yield from texts
+	finally:
+		pool.shutdown(wait=False, cancel_futures=True)
+		if temporary:
+			os.unlink(path)
+
+
+def _extract_pdf(file_like: BinaryIO, workers: Optional[int] = None) -> Text:
+	return "\n".join(iter_pdf_pages(file_like, workers)).strip()
+
+
+# Element names as reported by expat with namespace_separator=" "
+_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main "
+_W_P, _W_T, _W_TAB, _W_BR, _W_CR = (_W_NS + tag for tag in ("p", "t", "tab", "br", "cr"))
+_DOCX_XML_CHUNK_BYTES = 64 * 1024
+
+
+def _iter_docx_xml(file_like: BinaryIO) -> Iterator[Text]:
+	"""Paragraph texts of ``word/document.xml``, parsed with expat straight from the zip.
+
+	Paragraphs inside table cells (and text boxes) are yielded too, in document
+	order. No element tree is built and the part is decompressed in chunks, so
+	memory stays flat however large the document or its tables. Raises KeyError
+	if the package has no ``word/document.xml``.
+	"""
+	with zipfile.ZipFile(file_like) as package, package.open("word/document.xml") as xml:
+		parser = expat.ParserCreate(namespace_separator=" ")
+		parser.buffer_text = True
+		open_paragraphs: List[List[Text]] = []  # text pieces of each open paragraph (they nest in text boxes)
+		finished: List[Text] = []
+		in_text = False
 
+		def start(tag, attrs):
+			nonlocal in_text
+			if tag == _W_T:
+				in_text = True
+			elif tag == _W_P:
+				open_paragraphs.append([])
+			# Tabs and breaks map to the characters python-docx uses for them
+			elif tag == _W_TAB and open_paragraphs:
+				open_paragraphs[-1].append("\t")
+			elif (tag == _W_BR or tag == _W_CR) and open_paragraphs:
+				open_paragraphs[-1].append("\n")
+
+		def end(tag):
+			nonlocal in_text
+			if tag == _W_T:
+				in_text = False
+			elif tag == _W_P:
+				text = "".join(open_paragraphs.pop())
+				if text:
+					finished.append(text)
+
+		def data(text):
+			if in_text and open_paragraphs:
+				open_paragraphs[-1].append(text)
+
+		parser.StartElementHandler = start
+		parser.EndElementHandler = end
+		parser.CharacterDataHandler = data
+		while True:
+			chunk = xml.read(_DOCX_XML_CHUNK_BYTES)
+			parser.Parse(chunk, not chunk)
+			yield from finished
+			finished.clear()
+			if not chunk:
+				return
+
+
+def _iter_docx_python_docx(file_like: BinaryIO) -> Iterator[Text]:
+	from docx import Document
 
-def _extract_docx(file_like: io.BytesIO) -> Text:
 	doc = Document(file_like)
-	paragraphs = [p.text for p in doc.paragraphs if p.text]
-	return "\n".join(paragraphs).strip()
+	for p in doc.paragraphs:
+		if p.text:
+			yield p.text
+
+
+def _iter_docx(file_like: BinaryIO) -> Iterator[Text]:
+	"""Stream DOCX paragraphs, falling back to python-docx for packages the streaming reader cannot open."""
+	start = file_like.tell()
+	try:
+		pieces = _iter_docx_xml(file_like)
+		first = next(pieces, None)
+	except (KeyError, zipfile.BadZipFile, expat.ExpatError):
+		# e.g. the main document part is not at word/document.xml
+		file_like.seek(start)
+		yield from _iter_docx_python_docx(file_like)
+		return
+	if first is not None:
+		yield first
+		yield from pieces
+
+
+def _extract_docx(file_like: BinaryIO) -> Text:
+	return "\n".join(_iter_docx(file_like)).strip()
 
 
-def _extract_txt(file_like: io.BytesIO) -> Text:
-	data = file_like.read()
+def _extract_txt(file_like: BinaryIO, max_chars: int = 0) -> Text:
+	# UTF-8 needs at most 4 bytes per character, so this reads enough for max_chars
+	data = file_like.read(max_chars * 4 if max_chars > 0 else -1)
 	try:
 		return data.decode("utf-8", errors="replace").strip()
 	except Exception:
 		return data.decode(errors="replace").strip()
 
 
-def extract_text_from_upload(file_storage) -> Text:
-	"""Extract text content from a Werkzeug FileStorage (PDF, DOCX, or TXT)."""
+def _upload_extension(file_storage) -> str:
 	filename = file_storage.filename or ""
-	ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+	return filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+
+
+def _upload_fileno(stream) -> Optional[int]:
+	# SpooledTemporaryFile.fileno() forces a rollover, so an in-memory spool has no usable fd
+	if isinstance(stream, tempfile.SpooledTemporaryFile) and not getattr(stream, "_rolled", False):
+		return None
+	try:
+		return stream.fileno()
+	except (AttributeError, OSError, io.UnsupportedOperation):
+		return None
+
+
+def _spool_upload(file_storage, max_bytes: int) -> Tuple[BinaryIO, str]:
+	"""Return a seekable binary file with the upload's bytes and their SHA-256 hex digest.
+
+	An upload Werkzeug already spooled to disk (its SpooledTemporaryFile rolled
+	over) is memory-mapped, a BytesIO is used as is, and anything else (an
+	in-memory spool, a stream without a file descriptor) is copied in chunks to
+	a spooled temp file.
+	Raises UploadTooLarge as soon as more than ``max_bytes`` have been seen.
+	"""
+	stream = file_storage.stream
+	too_large = UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+
+	if isinstance(stream, io.BytesIO):
+		buffer = stream.getbuffer()
+		if max_bytes and buffer.nbytes > max_bytes:
+			raise too_large
+		digest = hashlib.sha256(buffer).hexdigest()
+		buffer.release()
+		stream.seek(0)
+		return stream, digest
+
+	fileno = _upload_fileno(stream)
+	if fileno is not None:
+		size = os.fstat(fileno).st_size
+		if max_bytes and size > max_bytes:
+			raise too_large
+		if size > 0:
+			mapped = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+			return _MappedFile(mapped), hashlib.sha256(mapped).hexdigest()
 
-	# Ensure we have a fresh BytesIO for libraries that read from start
-	memory_file = io.BytesIO(file_storage.read())
-	memory_file.seek(0)
+	spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MEMORY_BYTES)
+	digest = hashlib.sha256()
+	total = 0
+	while True:
+		chunk = stream.read(_COPY_CHUNK_BYTES)
+		if not chunk:
+			break
+		total += len(chunk)
+		if max_bytes and total > max_bytes:
+			spool.close()
+			raise too_large
+		digest.update(chunk)
+		spool.write(chunk)
+	spool.seek(0)
+	return spool, digest.hexdigest()
 
+
+def _limit_chars(pieces: Iterator[Text], max_chars: int) -> Iterator[Text]:
+	"""Pass pieces through until their newline-joined length reaches ``max_chars``, then stop extracting."""
+	if max_chars <= 0:
+		yield from pieces
+		return
+	remaining = max_chars
+	try:
+		for piece in pieces:
+			if len(piece) >= remaining:
+				yield piece[:remaining]
+				return
+			yield piece
+			remaining -= len(piece) + 1
+			if remaining <= 0:
+				return
+	finally:
+		pieces.close()
+
+
+def _iter_extracted(ext: str, file_like: BinaryIO, workers: Optional[int]) -> Iterator[Text]:
 	if ext == "pdf":
-		return _extract_pdf(memory_file)
+		yield from iter_pdf_pages(file_like, workers)
 	elif ext == "docx":
-		return _extract_docx(memory_file)
-	elif ext == "txt":
-		return _extract_txt(memory_file)
+		yield from _iter_docx(file_like)
 	else:
+		yield _extract_txt(file_like, EXTRACT_MAX_CHARS)
+
+
+def iter_text_from_upload(file_storage, workers: Optional[int] = None) -> Iterator[Text]:
+	"""Yield text pieces (PDF pages, DOCX paragraphs, or the whole TXT) as they are extracted.
+
+	Joining the pieces with newlines gives the same text as ``extract_text_from_upload``.
+	A cached upload yields its full text as a single piece. The upload is never
+	held in memory as a whole: it is capped at ``MAX_UPLOAD_BYTES`` (UploadTooLarge)
+	and extraction stops after ``EXTRACT_MAX_CHARS`` characters.
+	"""
+	ext = _upload_extension(file_storage)
+	if ext not in ("pdf", "docx", "txt"):
 		raise ValueError(f"Unsupported extension: {ext}")
+	source, digest = _spool_upload(file_storage, MAX_UPLOAD_BYTES)
+	try:
+		key = f"{ext}{_CACHE_KEY_VERSIONS.get(ext, '')}-{digest}"
+		cached = _extraction_cache.get(key)
+		if cached is not None:
+			yield cached
+			return
+
+		pieces = []
+		for piece in _limit_chars(_iter_extracted(ext, source, workers), EXTRACT_MAX_CHARS):
+			pieces.append(piece)
+			yield piece
+		_extraction_cache.set(key, "\n".join(pieces).strip())
+	finally:
+		if source is not file_storage.stream:
+			source.close()
+
+
+def extract_text_from_upload(file_storage, workers: Optional[int] = None) -> Text:
+	"""Extract text content from a Werkzeug FileStorage (PDF, DOCX, or TXT)."""
+	ext = _upload_extension(file_storage)
+	with EXTRACT_SECONDS.time(file_type=ext if ext in ("pdf", "docx", "txt") else "other"):
+		return "\n".join(iter_text_from_upload(file_storage, workers)).strip()
+
+
+def extraction_cache_stats() -> dict:
+	"""Hit/miss counters of the extraction cache."""
+	return _extraction_cache.stats()
+
+
+def _cache_metrics() -> List[str]:
+	stats = _extraction_cache.stats()
+	return stats_lines(
+		"quiz_extract_cache_requests_total", "Extraction cache lookups in this process.", "counter", "result",
+		{"hit": stats["hits"], "miss": stats["misses"]},
+	)
+
+
+register_collector(_cache_metrics)
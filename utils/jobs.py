@@ -0,0 +1,151 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from utils.cache import thread_local_connection
+
+# Background quiz generation: JOB_STORE=memory (per process) or sqlite (shared by all workers)
+JOB_STORE = (os.environ.get("JOB_STORE") or "memory").strip().lower()
+JOB_DB_PATH = os.environ.get("JOB_DB_PATH", "").strip() or os.path.join(tempfile.gettempdir(), "quiz_jobs.sqlite3")
+JOB_TTL = float(os.environ.get("JOB_TTL", "3600") or 3600)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "32") or 32)
+
+
+class MemoryJobStore:
+	"""Job records in this process only; records expire ``ttl`` seconds after their last update."""
+
+	def __init__(self, ttl: float = JOB_TTL):
+		self.ttl = ttl
+		self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+		self._lock = threading.Lock()
+
+	def _purge(self, now: float) -> None:
+		# Ordered by last update, so expired records are always at the front
+		while self._jobs:
+			job_id, job = next(iter(self._jobs.items()))
+			if now - job["updated"] <= self.ttl:
+				break
+			del self._jobs[job_id]
+
+	def create(self, job: Dict) -> None:
+		with self._lock:
+			self._purge(job["created"])
+			self._jobs[job["id"]] = dict(job)
+
+	def update(self, job_id: str, **fields) -> None:
+		with self._lock:
+			job = self._jobs.get(job_id)
+			if job is None:
+				return
+			job.update(fields, updated=time.time())
+			self._jobs.move_to_end(job_id)
+
+	def get(self, job_id: str) -> Optional[Dict]:
+		with self._lock:
+			self._purge(time.time())
+			job = self._jobs.get(job_id)
+			return dict(job) if job is not None else None
+
+
+class SQLiteJobStore:
+	"""Job records in a SQLite file so any worker process can answer status polls."""
+
+	def __init__(self, path: str = JOB_DB_PATH, ttl: float = JOB_TTL):
+		self.path = path
+		self.ttl = ttl
+		self._local = threading.local()
+		with self._connect() as conn:
+			conn.execute(
+				"CREATE TABLE IF NOT EXISTS jobs ("
+				"id TEXT PRIMARY KEY, status TEXT NOT NULL, result TEXT, error TEXT, "
+				"created REAL NOT NULL, updated REAL NOT NULL)"
+			)
+			conn.execute("CREATE INDEX IF NOT EXISTS jobs_updated ON jobs (updated)")
+
+	def _connect(self) -> sqlite3.Connection:
+		return thread_local_connection(self._local, self.path)
+
+	def create(self, job: Dict) -> None:
+		with self._connect() as conn:
+			conn.execute("DELETE FROM jobs WHERE updated < ?", (job["created"] - self.ttl,))
+			conn.execute(
+				"INSERT INTO jobs (id, status, result, error, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+				(job["id"], job["status"], None, None, job["created"], job["updated"]),
+			)
+
+	def update(self, job_id: str, **fields) -> None:
+		columns = {k: v for k, v in fields.items() if k in ("status", "result", "error")}
+		if "result" in columns:
+			columns["result"] = json.dumps(columns["result"])
+		columns["updated"] = time.time()
+		assignments = ", ".join(f"{name} = ?" for name in columns)
+		with self._connect() as conn:
+			conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*columns.values(), job_id))
+
+	def get(self, job_id: str) -> Optional[Dict]:
+		row = self._connect().execute(
+			"SELECT id, status, result, error, created, updated FROM jobs WHERE id = ? AND updated >= ?",
+			(job_id, time.time() - self.ttl),
+		).fetchone()
+		if row is None:
+			return None
+		return {
+			"id": row[0],
+			"status": row[1],
+			"result": json.loads(row[2]) if row[2] is not None else None,
+			"error": row[3],
+			"created": row[4],
+			"updated": row[5],
+		}
+
+
+class JobRunner:
+	"""Runs functions on a background thread pool and records their outcome in a job store.
+
+	Job status goes ``queued`` -> ``running`` -> ``done`` (with ``result``) or ``error``.
+	"""
+
+	def __init__(self, store, max_workers: int = JOB_WORKERS):
+		self.store = store
+		self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="quiz-job")
+
+	def submit(self, fn: Callable[..., Dict], params: Dict) -> Dict:
+		now = time.time()
+		job = {"id": uuid.uuid4().hex, "status": "queued", "result": None, "error": None, "created": now, "updated": now}
+		self.store.create(job)
+		self._executor.submit(self._run, job["id"], fn, params)
+		return job
+
+	def _run(self, job_id: str, fn: Callable[..., Dict], params: Dict) -> None:
+		self.store.update(job_id, status="running")
+		try:
+			result = fn(**params)
+		except Exception as exc:
+			self.store.update(job_id, status="error", error=str(exc))
+			return
+		self.store.update(job_id, status="done", result=result)
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+_runner_pid: Optional[int] = None
+
+
+def get_job_runner() -> JobRunner:
+	"""Process-wide job runner using the store selected by JOB_STORE."""
+	global _runner, _runner_pid
+	# Thread pools do not survive a fork, so each worker process builds its own runner
+	if _runner is None or _runner_pid != os.getpid():
+		with _runner_lock:
+			if _runner is None or _runner_pid != os.getpid():
+				store = SQLiteJobStore() if JOB_STORE == "sqlite" else MemoryJobStore()
+				_runner = JobRunner(store)
+				_runner_pid = os.getpid()
+	return _runner
@@ -0,0 +1,21 @@
+import importlib
+import threading
+from types import ModuleType
+from typing import Dict, Optional
+
+# Heavy optional dependencies (provider SDKs, numpy) are imported on first use, not at startup
+_modules: Dict[str, Optional[ModuleType]] = {}
+_lock = threading.Lock()
+
+
+def optional_module(name: str) -> Optional[ModuleType]:
+	"""Import ``name`` the first time it is needed; None if it is not installed (remembered)."""
+	if name in _modules:
+		return _modules[name]
+	with _lock:
+		if name not in _modules:
+			try:
+				_modules[name] = importlib.import_module(name)
+			except Exception:
+				_modules[name] = None
+	return _modules[name]
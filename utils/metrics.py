@@ -0,0 +1,233 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Each worker process keeps its own counters; scrape every worker (or run one)
+to see the whole service. Recording a sample is a lock, a bisect and two
+additions, so instrumentation stays far below the cost of the work it times.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond quizgen calls to slow AI providers
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry: List["_Metric"] = []
+_collectors: List[Callable[[], List[str]]] = []
+
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+	parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+	if extra:
+		parts.append(extra)
+	return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+	return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+	return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+	kind = ""
+
+	def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+		self.name = name
+		self.help = help_text
+		self.labels = tuple(labels)
+		self._lock = threading.Lock()
+		_registry.append(self)
+
+	def _key(self, labels: Dict) -> Tuple:
+		return tuple(str(labels.get(name, "")) for name in self.labels)
+
+	def render(self) -> List[str]:
+		return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+	def _samples(self) -> List[str]:
+		raise NotImplementedError
+
+
+class Counter(_Metric):
+	"""Monotonic count, optionally split by labels."""
+
+	kind = "counter"
+
+	def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+		super().__init__(name, help_text, labels)
+		self._values: Dict[Tuple, float] = {}
+
+	def inc(self, amount: float = 1, **labels) -> None:
+		key = self._key(labels)
+		with self._lock:
+			self._values[key] = self._values.get(key, 0) + amount
+
+	def _samples(self) -> List[str]:
+		with self._lock:
+			items = sorted(self._values.items())
+		return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(v)}" for key, v in items]
+
+
+class Gauge(Counter):
+	"""Value that goes up and down, e.g. requests in flight."""
+
+	kind = "gauge"
+
+	def dec(self, amount: float = 1, **labels) -> None:
+		self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+	"""Observations counted into cumulative ``le`` buckets, with their sum and count."""
+
+	kind = "histogram"
+
+	def __init__(
+		self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+	):
+		super().__init__(name, help_text, labels)
+		self.buckets = tuple(sorted(buckets))
+		# Per label set: [count per bucket (+Inf last)], sum
+		self._series: Dict[Tuple, Tuple[List[int], List[float]]] = {}
+
+	def observe(self, value: float, **labels) -> None:
+		key = self._key(labels)
+		slot = bisect_left(self.buckets, value)
+		with self._lock:
+			series = self._series.get(key)
+			if series is None:
+				series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+			series[0][slot] += 1
+			series[1][0] += value
+
+	def time(self, **labels) -> "_Timer":
+		"""Observe the wall time of the ``with`` block, whether or not it raises."""
+		return _Timer(self, labels)
+
+	def _samples(self) -> List[str]:
+		with self._lock:
+			items = sorted((key, list(counts), total[0]) for key, (counts, total) in self._series.items())
+		lines = []
+		for key, counts, total in items:
+			cumulative = 0
+			for bound, count in zip(self.buckets + (float("inf"),), counts):
+				cumulative += count
+				le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+				lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+			lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+			lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+		return lines
+
+
+class _Timer:
+	# A plain class rather than @contextmanager: entering a generator costs several times more
+	__slots__ = ("histogram", "labels", "start")
+
+	def __init__(self, histogram: Histogram, labels: Dict):
+		self.histogram = histogram
+		self.labels = labels
+
+	def __enter__(self) -> "_Timer":
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, *exc_info) -> None:
+		self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+def register_collector(fn: Callable[[], List[str]]) -> None:
+	"""Add a callable that returns extra exposition lines at scrape time (e.g. cache stats)."""
+	_collectors.append(fn)
+
+
+def render_metrics() -> str:
+	"""Every registered metric in the Prometheus text format (version 0.0.4)."""
+	lines: List[str] = []
+	for metric in _registry:
+		lines.extend(metric.render())
+	for collect in _collectors:
+		lines.extend(collect())
+	return "\n".join(lines) + "\n"
+
+
+def stats_lines(name: str, help_text: str, kind: str, label: str, values: Dict[str, Optional[float]]) -> List[str]:
+	"""Exposition lines for a family read from an existing stats dict, one sample per label value."""
+	lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+	for value_label, value in values.items():
+		if value is not None:
+			lines.append(f'{name}{{{label}="{_escape(value_label)}"}} {_format_value(value)}')
+	return lines
+
+
+def instrument_flask(app) -> None:
+	"""Record request latency by route and status, and the number of requests in flight."""
+	from flask import g, request
+
+	@app.before_request
+	def _metrics_start():
+		g.metrics_start = time.perf_counter()
+		ACTIVE_REQUESTS.inc()
+
+	@app.after_request
+	def _metrics_status(response):
+		g.metrics_status = response.status_code
+		return response
+
+	# Teardown runs after a streamed response has finished, so SSE requests are timed in full
+	@app.teardown_request
+	def _metrics_finish(exc):
+		start = g.pop("metrics_start", None)
+		if start is None:
+			return
+		ACTIVE_REQUESTS.dec()
+		rule = request.url_rule.rule if request.url_rule is not None else "unmatched"
+		status = g.pop("metrics_status", 500 if exc is not None else "")
+		REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=rule, status=status)
+
+
+class _InstrumentedASGI:
+	def __init__(self, app, endpoint: str):
+		self.app = app
+		self.endpoint = endpoint
+
+	async def __call__(self, scope, receive, send):
+		start = time.perf_counter()
+		status = 500
+
+		async def send_with_status(message):
+			nonlocal status
+			if message["type"] == "http.response.start":
+				status = message["status"]
+			await send(message)
+
+		ACTIVE_REQUESTS.inc()
+		try:
+			# Returns once the last body chunk is sent, so streamed responses are timed in full
+			await self.app(scope, receive, send_with_status)
+		finally:
+			ACTIVE_REQUESTS.dec()
+			REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=self.endpoint, status=status)
+
+
+def instrument_asgi(app, endpoint: str):
+	"""Wrap an ASGI app so its requests are recorded like ``instrument_flask`` records Flask routes."""
+	return _InstrumentedASGI(app, endpoint)
+
+
+# Shared instruments, labelled by the dimension that explains their latency
+REQUEST_SECONDS = Histogram("quiz_request_duration_seconds", "HTTP request latency.", ("endpoint", "status"))
+ACTIVE_REQUESTS = Gauge("quiz_active_requests", "Requests currently being served.")
+EXTRACT_SECONDS = Histogram("quiz_extract_duration_seconds", "Text extraction time per upload.", ("file_type",))
+QUIZGEN_SECONDS = Histogram("quiz_quizgen_duration_seconds", "Heuristic quiz generation time.", ("mode",))
+AI_CALL_SECONDS = Histogram(
+	"quiz_ai_call_duration_seconds", "AI provider call time, including retries.", ("provider", "outcome")
+)
+AI_PARSE_SECONDS = Histogram(
+	"quiz_ai_parse_duration_seconds", "Parsing and validating an AI response.",
+	buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+AI_ERRORS = Counter("quiz_ai_errors_total", "Quiz requests whose AI generation raised an error.", ("provider",))
+AI_FALLBACKS = Counter("quiz_ai_fallbacks_total", "Quiz requests answered by the heuristic fallback.", ("provider",))
@@ -0,0 +1,411 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from utils.ai_quiz import generate_quiz_ai, generate_quiz_ai_async, iter_quiz_ai, iter_quiz_ai_async, warm_up_clients
+from utils.cache import sha256_hex
+from utils.documents import load_document
+from utils.lazy import optional_module
+from utils.metrics import AI_ERRORS, AI_FALLBACKS
+from utils.quizgen import generate_quiz, iter_quiz
+
+# Batch generation: items per request, processes for heuristic items (0 = threads only),
+# and concurrent AI calls per batch
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "100") or 100)
+BATCH_PROCESSES = int(os.environ.get("BATCH_PROCESSES", str(os.cpu_count() or 1)) or 0)
+BATCH_AI_CONCURRENCY = int(os.environ.get("BATCH_AI_CONCURRENCY", "16") or 1)
+# Seconds browsers, proxies and CDNs may reuse a seeded heuristic quiz
+QUIZ_CACHE_MAX_AGE = int(os.environ.get("QUIZ_CACHE_MAX_AGE", "3600") or 0)
+# Part of every quiz ETag; bump it when the heuristic output for a given seed changes
+_ETAG_VERSION = "2"
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_pid: Optional[int] = None
+_process_pool_lock = threading.Lock()
+
+
+def ai_provider_name() -> str:
+	return "google" if os.environ.get("GOOGLE_API_KEY") or (os.environ.get("AI_PROVIDER", "").lower() == "google") else "openai"
+
+
+def ai_credentials_present() -> bool:
+	has_openai_like = bool(os.environ.get("AI_API_KEY") or os.environ.get("OPENAI_API_KEY"))
+	has_google = bool(os.environ.get("GOOGLE_API_KEY") or (os.environ.get("AI_PROVIDER", "").lower() == "google"))
+	return has_openai_like or has_google
+
+
+def quiz_params(payload: Dict) -> Dict:
+	"""``parse_quiz_payload``, with AI turned off when no provider credentials are configured."""
+	params = parse_quiz_payload(payload)
+	# Graceful fallback: if no provider credentials are present, disable AI mode
+	if params["use_ai"] and not ai_credentials_present():
+		params["use_ai"] = False
+	return params
+
+
+def _count_ai_outcome(provider: Optional[str], fallback: bool, ai_error: Optional[str]) -> None:
+	if ai_error:
+		AI_ERRORS.inc(provider=provider or "")
+	if fallback:
+		AI_FALLBACKS.inc(provider=provider or "")
+
+
+def warm_up() -> Dict[str, object]:
+	"""Load everything the first real request would otherwise pay for.
+
+	Returns milliseconds per step, or the error message of a step that failed.
+	"""
+	steps = {
+		"pdf": lambda: optional_module("PyPDF2"),
+		"docx": lambda: optional_module("docx"),
+		"numpy": lambda: optional_module("numpy"),
+		"quizgen": lambda: generate_quiz("The enzyme converts glucose into usable energy.", num_questions=1),
+		"ai_clients": lambda: warm_up_clients() if ai_credentials_present() else None,
+	}
+	timings: Dict[str, object] = {}
+	for name, step in steps.items():
+		start = time.perf_counter()
+		try:
+			step()
+			timings[name] = round((time.perf_counter() - start) * 1e3, 3)
+		except Exception as exc:
+			timings[name] = f"error: {exc}"
+	return timings
+
+
+def _flag(value) -> bool:
+	# Query strings carry flags as text, e.g. ?use_ai=false
+	if isinstance(value, str):
+		return value.strip().lower() in ("1", "true", "yes", "on")
+	return bool(value)
+
+
+def _quiz_options(payload: Dict) -> Dict:
+	"""Every ``run_quiz`` argument except the text itself."""
+	doc_id = str(payload.get("doc_id") or "").strip().lower() or None
+	num_questions = int(payload.get("num_questions") or 5)
+	# Enforce quiz generation limit: 1..100
+	num_questions = max(1, min(100, num_questions))
+	mode = (payload.get("mode") or "mcq").strip().lower()
+	use_ai = _flag(payload.get("use_ai"))
+	# Skip the AI response cache, e.g. to get a fresh set of questions
+	use_cache = not _flag(payload.get("no_cache"))
+	seed = payload.get("seed")
+	if seed is not None and seed != "":
+		try:
+			seed = int(seed)
+		except (TypeError, ValueError):
+			raise ValueError("seed must be an integer")
+	else:
+		seed = None
+	return {
+		"num_questions": num_questions,
+		"mode": mode,
+		"use_ai": use_ai,
+		"use_cache": use_cache,
+		"doc_id": doc_id,
+		"seed": seed,
+	}
+
+
+def parse_quiz_payload(payload: Dict) -> Dict:
+	"""Validate a /generate-quiz style payload into keyword arguments for ``run_quiz``.
+
+	``doc_id`` (from /upload) may be given in place of ``text``. Raises ValueError
+	when no text is given, or DocumentNotFound when the document has expired.
+	"""
+	options = _quiz_options(payload)
+	doc_id = options["doc_id"]
+	text = load_document(doc_id) if doc_id else payload.get("text") or ""
+	text = text.strip()
+	if not text:
+		raise ValueError("Text is required")
+	return {"text": text, **options}
+
+
+def quiz_etag(payload: Dict) -> Optional[str]:
+	"""Strong ETag (unquoted) of a reproducible quiz request, or None.
+
+	Only seeded requests without AI are reproducible. The tag is derived from
+	the text hash (the doc_id), mode, count and seed, so it can be checked before
+	the document is loaded; seeded generation ignores the upload corpus, so
+	nothing else affects the output. Raises ValueError for an invalid payload.
+	"""
+	options = _quiz_options(payload)
+	if options["seed"] is None or options["use_ai"]:
+		return None
+	# A doc_id is the same hash of the same (stripped) text, so both forms share a tag
+	text_hash = options["doc_id"] or sha256_hex((payload.get("text") or "").strip())[:32]
+	parts = (_ETAG_VERSION, text_hash, options["mode"], str(options["num_questions"]), str(options["seed"]))
+	return sha256_hex(*parts)[:32]
+
+
+def run_quiz(
+	text: str, num_questions: int, mode: str, use_ai: bool, use_cache: bool = True, doc_id: Optional[str] = None,
+	seed: Optional[int] = None,
+) -> Dict:
+	"""Generate questions with AI when requested, falling back to the heuristic generator.
+
+	Returns the /generate-quiz response body (without any endpoint-specific fields).
+	"""
+	used_ai = False
+	provider = None
+	fallback_used = False
+	ai_error = None
+	questions = []
+	if use_ai:
+		try:
+			provider = ai_provider_name()
+			questions = generate_quiz_ai(text, num_questions=num_questions, mode=mode, use_cache=use_cache)
+			used_ai = True if questions else False
+		except Exception as e:
+			used_ai = False
+			questions = []
+			ai_error = str(e)
+	if not questions:
+		questions = generate_quiz(text, num_questions=num_questions, mode=mode, key=doc_id, seed=seed)
+		fallback_used = use_ai
+	_count_ai_outcome(provider, fallback_used, ai_error)
+	return {
+		"questions": questions,
+		"used_ai": used_ai,
+		"provider": provider,
+		"fallback": fallback_used,
+		"ai_error": ai_error
+	}
+
+
+def iter_run_quiz(
+	text: str, num_questions: int, mode: str, use_ai: bool, use_cache: bool = True, doc_id: Optional[str] = None,
+	seed: Optional[int] = None,
+) -> Iterator[Tuple[str, Dict]]:
+	"""Streaming ``run_quiz``: yields ("question", question) as each one is produced,
+	then a single ("done", summary) with the remaining response fields.
+
+	If the AI stream fails part-way, the questions already sent are kept and the
+	rest are filled in by the heuristic generator.
+	"""
+	used_ai = False
+	provider = None
+	ai_error = None
+	sent = 0
+	if use_ai:
+		provider = ai_provider_name()
+		try:
+			for question in iter_quiz_ai(text, num_questions=num_questions, mode=mode, use_cache=use_cache):
+				sent += 1
+				yield "question", question
+		except Exception as e:
+			ai_error = str(e)
+		used_ai = sent > 0
+	fallback_used = False
+	if not used_ai or (ai_error and sent < num_questions):
+		fallback_used = use_ai
+		questions = iter_quiz(text, num_questions=num_questions, mode=mode, key=doc_id, seed=seed)
+		for question in islice(questions, num_questions - sent):
+			sent += 1
+			yield "question", question
+	_count_ai_outcome(provider, fallback_used, ai_error)
+	yield "done", {
+		"count": sent,
+		"used_ai": used_ai,
+		"provider": provider,
+		"fallback": fallback_used,
+		"ai_error": ai_error
+	}
+
+
+async def run_quiz_async(
+	text: str, num_questions: int, mode: str, use_ai: bool, use_cache: bool = True, doc_id: Optional[str] = None,
+	seed: Optional[int] = None,
+) -> Dict:
+	"""``run_quiz`` for the ASGI app: the AI call runs on the event loop and the
+	heuristic generator on a worker thread, so neither blocks other requests.
+	"""
+	used_ai = False
+	provider = None
+	fallback_used = False
+	ai_error = None
+	questions = []
+	if use_ai:
+		try:
+			provider = ai_provider_name()
+			questions = await generate_quiz_ai_async(text, num_questions=num_questions, mode=mode, use_cache=use_cache)
+			used_ai = True if questions else False
+		except Exception as e:
+			used_ai = False
+			questions = []
+			ai_error = str(e)
+	if not questions:
+		questions = await asyncio.to_thread(
+			generate_quiz, text, num_questions=num_questions, mode=mode, key=doc_id, seed=seed
+		)
+		fallback_used = use_ai
+	_count_ai_outcome(provider, fallback_used, ai_error)
+	return {
+		"questions": questions,
+		"used_ai": used_ai,
+		"provider": provider,
+		"fallback": fallback_used,
+		"ai_error": ai_error
+	}
+
+
+async def iter_run_quiz_async(
+	text: str, num_questions: int, mode: str, use_ai: bool, use_cache: bool = True, doc_id: Optional[str] = None,
+	seed: Optional[int] = None,
+) -> AsyncIterator[Tuple[str, Dict]]:
+	"""Async ``iter_run_quiz``. Heuristic questions are generated on a worker thread
+	and sent together once they are ready.
+	"""
+	used_ai = False
+	provider = None
+	ai_error = None
+	sent = 0
+	if use_ai:
+		provider = ai_provider_name()
+		try:
+			async for question in iter_quiz_ai_async(text, num_questions=num_questions, mode=mode, use_cache=use_cache):
+				sent += 1
+				yield "question", question
+		except Exception as e:
+			ai_error = str(e)
+		used_ai = sent > 0
+	fallback_used = False
+	if not used_ai or (ai_error and sent < num_questions):
+		fallback_used = use_ai
+		questions = await asyncio.to_thread(
+			lambda count: list(islice(iter_quiz(text, num_questions=num_questions, mode=mode, key=doc_id, seed=seed), count)),
+			num_questions - sent,
+		)
+		for question in questions:
+			sent += 1
+			yield "question", question
+	_count_ai_outcome(provider, fallback_used, ai_error)
+	yield "done", {
+		"count": sent,
+		"used_ai": used_ai,
+		"provider": provider,
+		"fallback": fallback_used,
+		"ai_error": ai_error
+	}
+
+
+def format_sse(event: str, data: Dict) -> str:
+	return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def parse_batch_payload(
+	payload: Dict, parse_item: Callable[[Dict], Dict] = parse_quiz_payload
+) -> List[Union[Dict, ValueError]]:
+	"""Parse ``{"items": [...]}`` into per-item ``run_quiz`` arguments.
+
+	Invalid items are returned as their ValueError so they can be reported in
+	place; an invalid envelope raises ValueError.
+	"""
+	items = payload.get("items")
+	if not isinstance(items, list) or not items:
+		raise ValueError("items must be a non-empty list")
+	if len(items) > BATCH_MAX_ITEMS:
+		raise ValueError(f"At most {BATCH_MAX_ITEMS} items per batch")
+	parsed: List[Union[Dict, ValueError]] = []
+	for item in items:
+		try:
+			parsed.append(parse_item(item if isinstance(item, dict) else {}))
+		except ValueError as exc:
+			parsed.append(exc)
+	return parsed
+
+
+def _get_process_pool() -> Optional[ProcessPoolExecutor]:
+	global _process_pool, _process_pool_pid
+	if BATCH_PROCESSES <= 1:
+		return None
+	with _process_pool_lock:
+		# A pool inherited through fork is unusable, so each worker builds its own
+		if _process_pool is None or _process_pool_pid != os.getpid():
+			try:
+				_process_pool = ProcessPoolExecutor(max_workers=BATCH_PROCESSES)
+			except (OSError, NotImplementedError):
+				# e.g. serverless sandboxes without multiprocessing support
+				return None
+			_process_pool_pid = os.getpid()
+	return _process_pool
+
+
+def _discard_process_pool(pool: ProcessPoolExecutor) -> None:
+	"""Drop a broken pool (e.g. a worker was OOM-killed) so the next batch builds a fresh one."""
+	global _process_pool
+	with _process_pool_lock:
+		if _process_pool is pool:
+			_process_pool = None
+	pool.shutdown(wait=False)
+
+
+def _submit_to_process_pool(
+	pool: ProcessPoolExecutor, item: Dict
+) -> Tuple[Optional[Future], Optional[ProcessPoolExecutor]]:
+	"""Submit ``item`` to ``pool``, replacing the pool once if it is broken.
+
+	Returns the future, or None when no working pool is available, and the pool for the next item.
+	"""
+	try:
+		return pool.submit(run_quiz, **item), pool
+	except BrokenProcessPool:
+		_discard_process_pool(pool)
+	pool = _get_process_pool()
+	if pool is not None:
+		try:
+			return pool.submit(run_quiz, **item), pool
+		except BrokenProcessPool:
+			_discard_process_pool(pool)
+	return None, None
+
+
+def run_quiz_batch(items: List[Union[Dict, ValueError]]) -> List[Dict]:
+	"""Run many ``run_quiz`` calls at once and return their results in input order.
+
+	Heuristic items are spread over a process pool and AI items over a thread
+	pool, so a batch takes roughly as long as its slowest item. Failures are
+	reported per item as ``{"error": ...}``. If the process pool breaks, it is
+	replaced for the next batch and the affected items run in this process.
+	"""
+	jobs = [item for item in items if isinstance(item, dict)]
+	heuristic = [item for item in jobs if not item["use_ai"]]
+	process_pool = _get_process_pool() if len(heuristic) > 1 else None
+	futures: Dict[int, Future] = {}
+	# The process pool each heuristic future came from, to discard it if it breaks
+	owners: Dict[int, ProcessPoolExecutor] = {}
+	with ThreadPoolExecutor(max_workers=max(1, min(BATCH_AI_CONCURRENCY, len(jobs)))) as thread_pool:
+		for index, item in enumerate(items):
+			if not isinstance(item, dict):
+				continue
+			future = None
+			if process_pool is not None and not item["use_ai"]:
+				future, process_pool = _submit_to_process_pool(process_pool, item)
+				if future is not None:
+					owners[index] = process_pool
+			futures[index] = future if future is not None else thread_pool.submit(run_quiz, **item)
+
+		results: List[Dict] = []
+		for index, item in enumerate(items):
+			if not isinstance(item, dict):
+				results.append({"error": str(item)})
+				continue
+			try:
+				try:
+					result = futures[index].result()
+				except BrokenProcessPool:
+					# A pool worker died mid-batch; the pool is rebuilt next time and this item runs here
+					_discard_process_pool(owners[index])
+					result = run_quiz(**item)
+				results.append(result)
+			except Exception as exc:
+				results.append({"error": f"Quiz generation failed: {exc}"})
+	return results
@@ -0,0 +1,186 @@
+"""Opt-in cProfile capture of slow requests.
+
+A request is profiled when it carries ``X-Profile: <PROFILE_TOKEN>`` or is
+picked by ``PROFILE_SAMPLE_RATE``. The ``PROFILE_KEEP`` slowest profiles of
+each worker process are kept in memory and can be rendered as pstats text, a
+binary pstats dump (``pstats.Stats(path)`` loads it) or collapsed stacks for
+flame-graph tools.
+"""
+import cProfile
+import heapq
+import hmac
+import io
+import itertools
+import marshal
+import os
+import pstats
+import random
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Shared secret for the X-Profile header and the /admin/profiles endpoints (unset = both disabled)
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "").strip()
+PROFILE_HEADER = "X-Profile"
+# Fraction of requests profiled without the header (0 = header only)
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0") or 0)
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "20") or 20)
+
+# Only one cProfile can be active at a time; concurrent requests simply go unprofiled
+_active = threading.Lock()
+_store_lock = threading.Lock()
+# Min-heap of (duration, seq, record): the fastest kept profile is evicted first
+_slowest: List[Tuple[float, int, Dict]] = []
+_seq = itertools.count(1)
+
+
+def token_matches(value: Optional[str]) -> bool:
+	return bool(PROFILE_TOKEN) and bool(value) and hmac.compare_digest(value, PROFILE_TOKEN)
+
+
+def should_profile(header_value: Optional[str]) -> bool:
+	"""Whether a request with this X-Profile header value is profiled."""
+	if PROFILE_KEEP <= 0:
+		return False
+	if token_matches(header_value):
+		return True
+	return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _keep(record: Dict) -> None:
+	with _store_lock:
+		entry = (record["duration"], record["id"], record)
+		if len(_slowest) < PROFILE_KEEP:
+			heapq.heappush(_slowest, entry)
+		elif entry[0] > _slowest[0][0]:
+			heapq.heapreplace(_slowest, entry)
+
+
+def run_profiled(name: str, fn: Callable[[], T], content_length: Optional[int] = None) -> T:
+	"""Call ``fn`` under cProfile and keep the profile as ``name``; unprofiled if another profile is running.
+
+	cProfile only sees the calling thread, so ``fn`` must do its work there.
+	"""
+	if not _active.acquire(blocking=False):
+		return fn()
+	profile = cProfile.Profile()
+	start = time.perf_counter()
+	try:
+		profile.enable()
+		try:
+			return fn()
+		finally:
+			profile.disable()
+	finally:
+		_active.release()
+		duration = time.perf_counter() - start
+		profile.create_stats()
+		_keep({
+			"id": next(_seq),
+			"endpoint": name,
+			"duration": duration,
+			"timestamp": time.time(),
+			"content_length": content_length,
+			"stats": profile.stats,
+		})
+
+
+def profiled(name: str) -> Callable:
+	"""Decorator for a Flask view: profile the call when the request opts in (see module docstring)."""
+
+	def decorate(view: Callable) -> Callable:
+		@wraps(view)
+		def wrapper(*args, **kwargs):
+			from flask import request
+
+			if not should_profile(request.headers.get(PROFILE_HEADER)):
+				return view(*args, **kwargs)
+			return run_profiled(name, lambda: view(*args, **kwargs), request.content_length)
+
+		return wrapper
+
+	return decorate
+
+
+def list_profiles() -> List[Dict]:
+	"""Kept profiles, slowest first, without their stats."""
+	with _store_lock:
+		records = sorted((entry[2] for entry in _slowest), key=lambda r: r["duration"], reverse=True)
+	return [
+		{
+			"id": r["id"],
+			"endpoint": r["endpoint"],
+			"duration_ms": round(r["duration"] * 1e3, 3),
+			"timestamp": r["timestamp"],
+			"content_length": r["content_length"],
+		}
+		for r in records
+	]
+
+
+def get_profile(profile_id: int) -> Optional[Dict]:
+	with _store_lock:
+		for _, _, record in _slowest:
+			if record["id"] == profile_id:
+				return record
+	return None
+
+
+def _label(func: Tuple[str, int, str]) -> str:
+	filename, line, name = func
+	if filename == "~":
+		return name.replace(";", ",")  # built-ins, e.g. "<method 'sub' of 're.Pattern' objects>"
+	return f"{name} ({os.path.basename(filename)}:{line})".replace(";", ",")
+
+
+def _collapsed(stats: Dict, max_depth: int = 64) -> str:
+	"""Collapsed stacks (``a;b;c <microseconds>``) rebuilt from the cProfile call graph.
+
+	cProfile records caller->callee edges, not whole stacks, so each function's
+	time is split across its callers in proportion to the cumulative time of
+	each edge. Good for spotting hot paths; exact only for tree-shaped call graphs.
+	"""
+	callees: Dict[Tuple, List[Tuple[Tuple, float]]] = {}
+	for func, (_, _, _, _, callers) in stats.items():
+		for caller, edge in callers.items():
+			callees.setdefault(caller, []).append((func, edge[3]))
+	roots = [func for func, entry in stats.items() if not any(c in stats for c in entry[4])]
+	totals: Dict[str, float] = {}
+
+	def walk(func, path: List[str], weight: float, seen: frozenset) -> None:
+		tt, ct = stats[func][2], stats[func][3]
+		labels = path + [_label(func)]
+		if tt * weight >= 1e-6:
+			key = ";".join(labels)
+			totals[key] = totals.get(key, 0.0) + tt * weight
+		if len(labels) >= max_depth:
+			return
+		for callee, edge_ct in callees.get(func, ()):
+			callee_ct = stats[callee][3]
+			if callee in seen or not callee_ct:
+				continue
+			share = weight * edge_ct / callee_ct
+			if share * callee_ct >= 1e-6:
+				walk(callee, labels, share, seen | {callee})
+
+	for root in roots:
+		walk(root, [], 1.0, frozenset((root,)))
+	return "".join(f"{stack} {int(seconds * 1e6)}\n" for stack, seconds in sorted(totals.items()) if seconds >= 1e-6)
+
+
+def render_profile(record: Dict, fmt: str = "text", limit: int = 50) -> Tuple[bytes, str]:
+	"""Body and mimetype of a kept profile as ``text`` (pstats report), ``pstats`` (binary) or ``collapsed``."""
+	if fmt == "pstats":
+		return marshal.dumps(record["stats"]), "application/octet-stream"
+	if fmt == "collapsed":
+		return _collapsed(record["stats"]).encode("utf-8"), "text/plain"
+	out = io.StringIO()
+	stats = pstats.Stats(stream=out)
+	stats.stats = record["stats"]
+	stats.get_top_level_stats()
+	out.write(f"{record['endpoint']} took {record['duration'] * 1e3:.1f} ms\n")
+	stats.sort_stats("cumulative").print_stats(limit)
+	return out.getvalue().encode("utf-8"), "text/plain"
@@ -1,7 +1,20 @@
+import os
 import random
 import re
+from array import array
 from collections import Counter
-from typing import Dict, List
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils.cache import LRUCache, sha256_hex
+from utils.corpus_index import get_corpus_index, index_document_async
+from utils.dedup import NearDuplicateFilter
+from utils.metrics import QUIZGEN_SECONDS, register_collector, stats_lines
+
+# Question pools are cached per document (by text hash) so re-generating only samples them
+QUIZ_POOL_CACHE_ENTRIES = int(os.environ.get("QUIZ_POOL_CACHE_ENTRIES", "64") or 0)
+# Candidates kept per pool; a request for more than half this many questions rebuilds a bigger one
+QUIZ_POOL_SIZE = int(os.environ.get("QUIZ_POOL_SIZE", "200") or 200)
 
 BASIC_STOPWORDS = {
 	"the","and","for","are","but","not","you","with","that","this","have","from","they",
@@ -13,136 +26,386 @@ BASIC_STOPWORDS = {
 }
 
 
+_pools = LRUCache(QUIZ_POOL_CACHE_ENTRIES)
+
 _word_pattern = re.compile(r"[A-Za-z][A-Za-z\-']+")
-_sentence_split = re.compile(r"(?<=[.!?])\s+")
+# Words and sentence breaks in one scan; group 1 is set for words only
+_scan_pattern = re.compile(r"([A-Za-z][A-Za-z\-']+)|(?<=[.!?])\s+")
 
 
 def _tokenize_words(text: str) -> List[str]:
 	return [w.lower() for w in _word_pattern.findall(text)]
 
 
-def _split_sentences(text: str) -> List[str]:
-	sentences = _sentence_split.split(text)
-	# Normalize spacing
-	return [re.sub(r"\s+", " ", s).strip() for s in sentences if s.strip()]
+class _SentenceTable:
+	"""Sentence offsets, token spans and word counts from a single scan of normalized text.
 
+	Sentence ``i`` covers ``text[sent_start[i]:sent_end[i]]`` and owns tokens
+	``sent_first_token[i]`` .. ``sent_first_token[i] + sent_word_count[i] - 1``.
+	Tokens are stored as spans plus an id into ``vocab`` (lowercased words).
+	"""
 
-def _choose_keyword(sentence: str, global_freq: Dict[str, int]) -> str:
-	words = _tokenize_words(sentence)
-	candidates = [w for w in words if len(w) > 3 and w not in BASIC_STOPWORDS and w in global_freq]
-	if not candidates:
-		return ""
-	# Choose the most frequent meaningful word across the whole text that is present in the sentence
-	candidates.sort(key=lambda w: (global_freq.get(w, 0), len(w)), reverse=True)
-	return candidates[0]
+	def __init__(self, text: str):
+		self.text = text
+		vocab_index: Dict[str, int] = {}
+		sent_bounds: List[int] = []
+		tok_start: List[int] = []
+		tok_end: List[int] = []
+		tok_id: List[int] = []
 
+		# Hot loop: bind methods locally and collect into lists before packing
+		lookup = vocab_index.get
+		add_start, add_end, add_id = tok_start.append, tok_end.append, tok_id.append
+		add_bounds = sent_bounds.extend
+		start = 0
+		first_token = 0
+		for m in _scan_pattern.finditer(text):
+			if m.lastindex:
+				s, e = m.span()
+				add_start(s)
+				add_end(e)
+				word = text[s:e].lower()
+				idx = lookup(word)
+				if idx is None:
+					idx = vocab_index[word] = len(vocab_index)
+				add_id(idx)
+			else:
+				add_bounds((start, m.start(), first_token, len(tok_id)))
+				start = m.end()
+				first_token = len(tok_id)
+		add_bounds((start, len(text), first_token, len(tok_id)))
 
-def _make_distractors(correct: str, global_freq: Dict[str, int], k: int) -> List[str]:
-	# Choose high-frequency words as distractors that are different from the correct answer
-	common = [w for w, _ in Counter(global_freq).most_common(100)
-			  if w != correct and len(w) > 3 and w not in BASIC_STOPWORDS]
-	random.shuffle(common)
-	return common[:k]
+		self.vocab: List[str] = list(vocab_index)
+		self.tok_start = array("l", tok_start)
+		self.tok_end = array("l", tok_end)
+		self.tok_id = array("l", tok_id)
+		self.sent_start = array("l")
+		self.sent_end = array("l")
+		self.sent_first_token = array("l")
+		self.sent_word_count = array("l")
+		for i in range(0, len(sent_bounds), 4):
+			s, e, first, last = sent_bounds[i:i + 4]
+			if s < e:
+				self.sent_start.append(s)
+				self.sent_end.append(e)
+				self.sent_first_token.append(first)
+				self.sent_word_count.append(last - first)
 
+	def __len__(self) -> int:
+		return len(self.sent_start)
 
-def _blank_word_in_sentence(sentence: str, word: str) -> str:
-	if not word:
-		return sentence
-	pattern = re.compile(rf"\b{re.escape(word)}\b", re.IGNORECASE)
-	return pattern.sub("_____", sentence, count=1)
+	def sentence(self, i: int) -> str:
+		return self.text[self.sent_start[i]:self.sent_end[i]]
 
+	def token_ids(self, i: int) -> array:
+		first = self.sent_first_token[i]
+		return self.tok_id[first:first + self.sent_word_count[i]]
 
-def _generate_mcq(sentences: List[str], freq: Dict[str, int], num_questions: int) -> List[Dict]:
-	questions = []
-	for sentence in sentences:
-		keyword = _choose_keyword(sentence, freq)
-		if not keyword:
-			continue
-		question_text = _blank_word_in_sentence(sentence, keyword)
-		if question_text == sentence:
-			continue
-		options = [keyword]
-		options.extend(_make_distractors(keyword, freq, 3))
-		options = list(dict.fromkeys(options))
-		if len(options) < 4:
+
+def _is_candidate(word: str) -> bool:
+	return len(word) > 3 and word not in BASIC_STOPWORDS
+
+
+def _choose_keyword(table: _SentenceTable, i: int, scores: Dict[str, float]) -> Tuple[str, int]:
+	"""Highest-scoring meaningful word in sentence ``i`` and the index of its first token.
+
+	Returns ``("", -1)`` when the sentence has no candidate.
+	"""
+	vocab = table.vocab
+	first = table.sent_first_token[i]
+	best, best_key = -1, None
+	for token, idx in enumerate(table.token_ids(i), first):
+		word = vocab[idx]
+		score = scores.get(word)
+		if score is None:
 			continue
-		options = options[:4]
-		random.shuffle(options)
-		answer_index = options.index(keyword)
-		questions.append({
-			"question": question_text,
-			"options": options,
-			"answer_index": answer_index,
-			"type": "mcq"
+		# Ties keep the earliest token, like replacing the first match
+		key = (score, len(word))
+		if best_key is None or key > best_key:
+			best, best_key = token, key
+	if best < 0:
+		return "", -1
+	return vocab[table.tok_id[best]], best
+
+
+def _is_standalone(table: _SentenceTable, token: int) -> bool:
+	"""False when the token is glued to digits or underscores (e.g. inside ``AI_MODEL``)."""
+	text = table.text
+	start, end = table.tok_start[token], table.tok_end[token]
+	before = text[start - 1] if start else " "
+	after = text[end] if end < len(text) else " "
+	return not (before.isalnum() or before == "_" or after.isalnum() or after == "_")
+
+
+def _replace_token(table: _SentenceTable, i: int, token: int, replacement: str) -> str:
+	"""Sentence ``i`` with ``token`` swapped for ``replacement``, by slicing at the token's span."""
+	text = table.text
+	return (
+		text[table.sent_start[i]:table.tok_start[token]]
+		+ replacement
+		+ text[table.tok_end[token]:table.sent_end[i]]
+	)
+
+
+def _length_band(word: str) -> int:
+	return min(len(word) // 3, 4)
+
+
+class _DocumentAnalysis:
+	"""Word statistics computed once per document and shared by every question."""
+
+	def __init__(self, table: _SentenceTable, pool_size: int = 100, use_corpus: bool = True):
+		self.table = table
+		# Global frequency map of meaningful words, counted over token ids
+		vocab = table.vocab
+		self.freq = Counter({
+			vocab[idx]: count for idx, count in Counter(table.tok_id).items()
+			if _is_candidate(vocab[idx])
 		})
-		if len(questions) >= num_questions:
-			break
-	return questions
+		freq = self.freq
+		# Keywords are ranked by TF-IDF against the upload corpus, or by raw frequency without one
+		self.score: Dict[str, float] = freq
+		index = get_corpus_index() if use_corpus else None
+		if index is not None and index.num_docs:
+			words = list(freq)
+			self.score = {w: freq[w] * weight for w, weight in zip(words, index.idf(words))}
+		# Ranked candidate pool of high-frequency meaningful words
+		self.pool = [w for w, _ in freq.most_common(pool_size)
+					 if len(w) > 3 and w not in BASIC_STOPWORDS]
+		# Same pool grouped by length band so distractors look like the answer
+		self.buckets: Dict[int, List[str]] = {}
+		for w in self.pool:
+			self.buckets.setdefault(_length_band(w), []).append(w)
 
 
-def _generate_true_false(sentences: List[str], freq: Dict[str, int], num_questions: int) -> List[Dict]:
-	questions = []
-	for sentence in sentences:
-		keyword = _choose_keyword(sentence, freq)
-		if not keyword:
-			continue
-		make_false = random.random() < 0.5
-		if make_false:
-			distractors = _make_distractors(keyword, freq, 1)
-			if not distractors:
+def _distractor_source(correct: str, words: List[str], buckets: Dict[int, List[str]]) -> List[str]:
+	# Prefer high-frequency words of a similar length to the answer when there are enough of them
+	bucket = buckets.get(_length_band(correct), [])
+	return bucket if len(bucket) > 3 else words
+
+
+def _available_distractors(correct: str, source: List[str]) -> int:
+	# Pool words are distinct, so only the answer itself is excluded
+	return len(source) - (correct in source)
+
+
+def _make_distractors(correct: str, source: List[str], k: int, rng: random.Random) -> List[str]:
+	"""Up to ``k`` distinct words of ``source`` other than ``correct``, in random order.
+
+	Draws indices with ``rng.random()`` until enough distinct words are found,
+	which is cheaper than ``rng.sample`` for the handful of words needed.
+	"""
+	k = min(k, _available_distractors(correct, source))
+	rand = rng.random
+	n = len(source)
+	picked: List[str] = []
+	while len(picked) < k:
+		word = source[int(rand() * n)]
+		if word != correct and word not in picked:
+			picked.append(word)
+	return picked
+
+
+class _QuestionPool:
+	"""Question candidates of one document (up to ``limit``), built once and sampled by each request for it.
+
+	A candidate is a sentence with its keyword's offsets, so blanking or
+	substituting the keyword is a slice. Near-duplicate sentences are dropped
+	while building. Distractors, option order and true/false statements are
+	drawn from each request's own random generator, so a seeded request is
+	reproducible. Without ``use_corpus`` keywords are ranked by raw frequency,
+	so the pool depends on the text alone.
+	"""
+
+	def __init__(self, text: str, limit: int, use_corpus: bool = True):
+		table = _SentenceTable(text)
+		analysis = _DocumentAnalysis(table, use_corpus=use_corpus)
+		self.limit = limit
+
+		counts = table.sent_word_count
+		# Filter sentences to be at most 30 words
+		order = [i for i in range(len(table)) if counts[i] <= 30]
+		# Prefer mid-length sentences that likely form a complete idea
+		order.sort(key=lambda i: (-counts[i], table.sentence(i)))
+
+		# (sentence, keyword, keyword start, keyword end, distractor source) per candidate, in preference order
+		self.candidates: List[Tuple[str, str, int, int, List[str]]] = []
+		# Candidates that can become an MCQ, and those that can be made false
+		self.mcq: List[int] = []
+		self.falsifiable: List[bool] = []
+		# False once ``limit`` candidates were found before running out of sentences
+		self.complete = True
+		seen = NearDuplicateFilter()
+		for i in order:
+			if len(self.candidates) >= limit:
+				self.complete = False
+				break
+			keyword, token = _choose_keyword(table, i, analysis.score)
+			if not keyword:
 				continue
-			false_word = distractors[0]
-			pattern = re.compile(rf"\b{re.escape(keyword)}\b", re.IGNORECASE)
-			mutated = pattern.sub(false_word, sentence, count=1)
-			stmt = mutated
+			sentence = table.sentence(i)
+			if not seen.add({"question": sentence}):
+				continue
+			offset = table.sent_start[i]
+			# A glued token cannot be blanked or swapped cleanly
+			standalone = _is_standalone(table, token)
+			source = _distractor_source(keyword, analysis.pool, analysis.buckets)
+			available = _available_distractors(keyword, source)
+			if standalone and available >= 3:
+				self.mcq.append(len(self.candidates))
+			self.falsifiable.append(standalone and available >= 1)
+			self.candidates.append(
+				(sentence, keyword, table.tok_start[token] - offset, table.tok_end[token] - offset, source)
+			)
+
+	def covers(self, num_questions: int) -> bool:
+		return self.complete or self.limit >= _pool_limit(num_questions)
+
+	def _mcq(self, c: int, rng: random.Random) -> Dict:
+		sentence, keyword, start, end, source = self.candidates[c]
+		options = _make_distractors(keyword, source, 3, rng)
+		# The distractors are already in random order, so a random slot for the answer shuffles all four
+		answer_index = int(rng.random() * 4)
+		options.insert(answer_index, keyword)
+		return {
+			"question": sentence[:start] + "_____" + sentence[end:],
+			"options": options,
+			"answer_index": answer_index,
+			"type": "mcq"
+		}
+
+	def _true_false(self, c: int, rng: random.Random) -> Optional[Dict]:
+		sentence, keyword, start, end, source = self.candidates[c]
+		if rng.random() < 0.5:
+			# An unchanged sentence is not false, so a candidate without a substitute is skipped
+			if not self.falsifiable[c]:
+				return None
+			substitute = _make_distractors(keyword, source, 1, rng)[0]
+			stmt = sentence[:start] + substitute + sentence[end:]
 			answer_index = 1  # False
 		else:
 			stmt = sentence
 			answer_index = 0  # True
-		questions.append({
+		return {
 			"question": stmt,
 			"options": ["True", "False"],
 			"answer_index": answer_index,
 			"type": "true_false"
-		})
-		if len(questions) >= num_questions:
-			break
-	return questions
+		}
+
+	def _stream(
+		self, candidates: Iterable[int], make: Callable[..., Optional[Dict]], used: set, rng: random.Random
+	) -> Iterator[Dict]:
+		for c in candidates:
+			if c in used:
+				continue
+			question = make(c, rng)
+			if question is not None:
+				used.add(c)
+				yield question
+
+	def questions(self, num_questions: int, mode: str, rng: random.Random) -> Iterator[Dict]:
+		"""Yield up to ``num_questions`` questions, touching only as many candidates as it takes."""
+		used: set = set()
+		if mode == "tf":
+			yield from islice(self._stream(range(len(self.candidates)), self._true_false, used, rng), num_questions)
+		elif mode == "mixed":
+			remaining = {"mcq": num_questions // 2, "tf": num_questions - num_questions // 2}
+			# Both streams walk the same candidates; the shared set keeps each sentence to one question
+			streams = {
+				"mcq": self._stream(self.mcq, self._mcq, used, rng),
+				"tf": self._stream(range(len(self.candidates)), self._true_false, used, rng),
+			}
+			while remaining["mcq"] > 0 or remaining["tf"] > 0:
+				# Pick the next type with probability proportional to what is left: a lazy shuffle
+				kind = "mcq" if rng.random() * (remaining["mcq"] + remaining["tf"]) < remaining["mcq"] else "tf"
+				question = next(streams[kind], None)
+				if question is None:
+					remaining[kind] = 0
+					continue
+				remaining[kind] -= 1
+				yield question
+		else:
+			# "mcq", and the fallback for unknown modes
+			yield from islice(self._stream(self.mcq, self._mcq, used, rng), num_questions)
+
+
+def _pool_limit(num_questions: int) -> int:
+	# True/false skips some candidates, so keep a margin over the request
+	return max(QUIZ_POOL_SIZE, 2 * num_questions)
+
+
+def _question_pool(
+	text: str, num_questions: int, key: Optional[str] = None, use_corpus: bool = True
+) -> Optional[_QuestionPool]:
+	"""Cached pool for ``text``, or None if it has no words. ``key`` is the text's doc_id when known."""
+	key = key or sha256_hex(text or "")[:32]
+	if not use_corpus:
+		key += ":frequency"
+	pool = _pools.get(key)
+	if pool is None or not pool.covers(num_questions):
+		clean_text = re.sub(r"\s+", " ", (text or "").strip())
+		if not clean_text:
+			return None
+		# One scan builds the sentence table; the global frequency map is counted from it
+		pool = _QuestionPool(clean_text, _pool_limit(num_questions), use_corpus)
+		_pools.set(key, pool)
+	return pool
+
+
+def iter_quiz(
+	text: str, num_questions: int = 5, mode: str = "mcq", key: Optional[str] = None, seed: Optional[int] = None
+) -> Iterator[Dict]:
+	"""
+	Lazily yield quiz questions from raw text, one at a time as they are built.
+	Takes the same arguments as ``generate_quiz``.
+	"""
+	# A negative count asks for nothing (islice would reject it)
+	num_questions = max(0, num_questions)
+	# The corpus index changes with every upload, so seeded requests rank keywords by frequency
+	# alone; otherwise the same seed could give different questions after new uploads
+	pool = _question_pool(text, num_questions, key, use_corpus=seed is None)
+	if pool is not None:
+		# A generator per request: seeded requests are reproducible and never share state
+		yield from pool.questions(num_questions, (mode or "mcq").lower(), random.Random(seed))
+
+
+def question_pool_stats() -> Dict[str, int]:
+	"""Hit/miss counters of the question pool cache."""
+	return _pools.stats()
+
+
+def _pool_metrics() -> List[str]:
+	stats = _pools.stats()
+	return stats_lines(
+		"quiz_question_pool_requests_total", "Question pool cache lookups in this process.", "counter", "result",
+		{"hit": stats["hits"], "miss": stats["misses"]},
+	)
+
+
+register_collector(_pool_metrics)
+
+
+def index_document(text: str) -> None:
+	"""Count an uploaded document's keyword candidates in the corpus index (in the background)."""
+	if not text or get_corpus_index() is None:
+		return
+	terms = {w for w in _tokenize_words(text) if _is_candidate(w)}
+	index_document_async(terms, sha256_hex(text))
 
 
-def generate_quiz(text: str, num_questions: int = 5, mode: str = "mcq") -> List[Dict]:
+def generate_quiz(
+	text: str, num_questions: int = 5, mode: str = "mcq", key: Optional[str] = None, seed: Optional[int] = None
+) -> List[Dict]:
 	"""
 	Generate quiz questions from raw text.
 	mode: "mcq" | "tf" | "mixed"
+	key: the text's doc_id, if known, so a cached question pool is found without hashing the text
+	seed: makes the output reproducible; the same text, mode, count and seed give the same questions
+	(keywords are then ranked by frequency in the text, not by TF-IDF against the upload corpus)
 	Returns a list of {question, options, answer_index, type} dicts.
 	"""
-	clean_text = re.sub(r"\s+", " ", (text or "").strip())
-	if not clean_text:
-		return []
-
-	# Build global frequency map
-	words = [w for w in _tokenize_words(clean_text) if len(w) > 3 and w not in BASIC_STOPWORDS]
-	freq = Counter(words)
-
-	sentences = _split_sentences(clean_text)
-	# Filter sentences to be at most 30 words
-	sentences = [s for s in sentences if len(_tokenize_words(s)) <= 30]
-	# Prefer mid-length sentences that likely form a complete idea
-	sentences.sort(key=lambda s: (-len(_tokenize_words(s)), s))
-
-	mode = (mode or "mcq").lower()
-	if mode == "mcq":
-		return _generate_mcq(sentences, freq, num_questions)
-	elif mode == "tf":
-		return _generate_true_false(sentences, freq, num_questions)
-	elif mode == "mixed":
-		mcq_count = num_questions // 2
-		tf_count = num_questions - mcq_count
-		mcqs = _generate_mcq(sentences, freq, mcq_count)
-		tfs = _generate_true_false(sentences, freq, tf_count)
-		combined = mcqs + tfs
-		random.shuffle(combined)
-		return combined
-	else:
-		# Fallback to mcq
-		return _generate_mcq(sentences, freq, num_questions)
+	num_questions = max(0, num_questions)
+	label = mode if mode in ("mcq", "tf", "mixed") else "mcq"
+	with QUIZGEN_SECONDS.time(mode=label):
+		return list(iter_quiz(text, num_questions, mode, key, seed))